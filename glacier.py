@@ -18,20 +18,30 @@ import os
 import sys
 
 # Critical dependencies check first
+# boto3 is only located here; it is imported on first S3 use (see get_s3_client)
 try:
-    import boto3
+    import importlib.util
     from tqdm import tqdm
+    if importlib.util.find_spec("boto3") is None:
+        raise ImportError("boto3")
 except ImportError:
     print("Error: Missing dependencies.")
     print("Please install required packages: pip install -r requirements.txt")
     print("Or ensure your virtual environment is activated.")
     sys.exit(1)
 
+# Optional: orjson parses and serializes inventory.json faster (falls back to stdlib json)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # System Metadata constants
 VERSION = "1.0"
 SYSTEM_NAME = "Glacier Mirror"
 SYSTEM_DESCRIPTION = "Amazon S3 Glacier Deep Archive Tape Backup Management"
 DEFAULT_TREE_FILE = "tree.cfg"  # <--- Chang to rename the file globally
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # Home of glacier.cfg, exclude.txt, key.txt
 
 # Standard library imports
 import re
@@ -39,23 +49,29 @@ import glob
 import time
 import threading
 import json
+import pickle
 import hashlib
 import logging
-import tarfile
 import subprocess
 import shutil
 import socket
 import argparse
 import configparser
 import io
+import math
 import shlex
-from contextlib import redirect_stdout
+import sqlite3
+import pathlib
+import tempfile
+import functools
+from contextlib import closing, redirect_stdout
+from stat import S_ISDIR, S_ISREG
 from datetime import datetime, timezone, timedelta
-from concurrent.futures import ThreadPoolExecutor
-from boto3.s3.transfer import TransferConfig # Added for throttling
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
 # Configuration handling
-config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'glacier.cfg')
+config_path = os.path.join(BASE_DIR, 'glacier.cfg')
 config = configparser.ConfigParser()
 
 if not os.path.exists(config_path):
@@ -73,10 +89,10 @@ def ensure_aws_metadata(config):
     stored_id = config.get('AWS', 'aws_account_id', fallback=None)
     stored_region = config.get('AWS', 'aws_region', fallback=None)
 
-    # 2. Privacy Logic: If either is already REDACTED, we stop here
+    # 2. Privacy Logic: If either is already REDACTED (or already discovered), we stop here
     # This allows a user to redact one, both, or neither.
-    final_id = stored_id if stored_id == "REDACTED" else None
-    final_region = stored_region if stored_region == "REDACTED" else None
+    final_id = stored_id or None
+    final_region = stored_region or None
 
     # 3. Discovery Logic: Only fetch what isn't already set (or redacted)
     if not final_id or not final_region:
@@ -121,16 +137,110 @@ try:
     INVENTORY_BAK_DIR = config['settings'].get('inventory_bak_dir', '').strip()
     if not INVENTORY_BAK_DIR:
         INVENTORY_BAK_DIR = None
+    PARALLEL_BRANCHES = max(1, config['settings'].getint('parallel_branches', fallback=1))
+    STAT_WORKERS = max(1, config['settings'].getint('stat_workers', fallback=32))
+    PARALLEL_BAGS = max(1, config['settings'].getint('parallel_bags', fallback=1))
+    COMPRESSOR = config['settings'].get('compressor', 'gzip').strip().lower()
+    UPLOAD_BUFFER_MB = max(1, config['settings'].getint('upload_buffer_mb', fallback=640))
 except KeyError as e:
     print(f"Error: Missing configuration key: {e}")
     sys.exit(1)
 
+# Leaf compressors for ::COMPRESS: the tar flag that creates the archive, the extension it is
+# stored under inside the bag, and the command that decompresses it again on restore
+COMPRESSORS = {
+    "gzip": {"tar_flag": "-z", "ext": ".gz", "decompress": "gunzip -c"},
+    "zstd": {"tar_flag": "--use-compress-program=zstd -T0 -3", "ext": ".zst", "decompress": "zstd -dc"},
+}
+if COMPRESSOR not in COMPRESSORS:
+    print(f"Error: Unknown compressor '{COMPRESSOR}' in [settings] (expected one of: {', '.join(COMPRESSORS)})")
+    sys.exit(1)
+COMPRESS_TAR_FLAG = COMPRESSORS[COMPRESSOR]["tar_flag"]
+COMPRESS_EXT = COMPRESSORS[COMPRESSOR]["ext"]
+
 # Global constants
 CURRENT_YEAR = datetime.now().strftime('%Y')
 S3_PREFIX = f"{CURRENT_YEAR}-backup/"
 BYTES_PER_GB = 1024 * 1024 * 1024
 TARGET_SIZE_BYTES = TARGET_BAG_GB * BYTES_PER_GB
-s3_client = boto3.client('s3')
+S3_CLIENT_CACHE = {}
+
+# exclude.txt is read on first use by the scan (see exclude_rules), so other commands never open it
+EXCLUDE_FILE = os.path.join(BASE_DIR, "exclude.txt")
+
+# One small timestamp file per branch, so cron can skip fresh branches without parsing inventory.json
+LAST_SCAN_DIR = os.path.join(os.path.dirname(os.path.abspath(INVENTORY_FILE)), ".glacier_last_scan")
+
+# SQLite copy of the manifest lines for --find; rebuilt per manifest whenever a .txt file changes
+MANIFEST_INDEX_FILE = os.path.join(MANIFEST_DIR, ".manifest_index.sqlite")
+
+# Serializes inventory mutation and saves when branches run in parallel
+INVENTORY_LOCK = threading.RLock()
+
+# Long-lived directories already created this run; ensure_dir skips the syscalls after the first call
+ENSURED_DIRS = set()
+
+# NDJSON transaction ledger; opened once on first write, writes serialized across threads
+AWS_LOG_FILE = os.path.join(os.path.dirname(config_path), 'logs', 'aws.log')
+AWS_LOG_LOCK = threading.Lock()
+
+# Shared pool for metadata stats; over SSHFS each stat is a network round-trip, so many run in flight
+STAT_EXECUTOR = ThreadPoolExecutor(max_workers=STAT_WORKERS, thread_name_prefix="stat")
+HASH_BATCH_BYTES = 64 * 1024
+
+# Leaves of one branch whose metadata is walked at the same time (their stats share STAT_EXECUTOR)
+LEAF_SCAN_WORKERS = 8
+
+# Key ranges of the bucket listed at the same time by --audit (one LIST call per range in flight)
+AUDIT_LIST_WORKERS = 16
+
+# File paths kept from the metadata walk per branch so bag manifests need no second walk
+MANIFEST_CACHE_FILES = 1_000_000
+
+# Multipart part size for bags streamed from tar into S3. Keep this at 64 MiB or above:
+# boto3's 8 MiB default measured several times slower on multi-GB objects.
+STREAM_CHUNK_BYTES = 64 * 1024 * 1024
+
+HTTP_BLOCKSIZE = 1024 * 1024
+
+# tar record size in 512-byte blocks: 1024 = 512 KiB writes instead of the default 10 KiB
+TAR_BLOCKING_FACTOR = 1024
+
+def raise_http_blocksize():
+    """
+    Raises the socket write size of the HTTP connections botocore opens from the
+    8 KiB (http.client) / 16 KiB (urllib3 2.x) defaults to HTTP_BLOCKSIZE, so
+    multipart bodies go out in large sends instead of thousands of small ones.
+    """
+    import http.client
+    defaults = http.client.HTTPConnection.__init__.__defaults__
+    http.client.HTTPConnection.__init__.__defaults__ = tuple(HTTP_BLOCKSIZE if d == 8192 else d for d in defaults)
+
+    import urllib3.connection
+    kwdefaults = urllib3.connection.HTTPConnection.__init__.__kwdefaults__
+    if kwdefaults and 'blocksize' in kwdefaults:
+        kwdefaults['blocksize'] = HTTP_BLOCKSIZE
+
+def get_s3_client():
+    """Imports boto3 and builds the S3 client on first use; local-only commands never pay for it."""
+    if 's3' not in S3_CLIENT_CACHE:
+        raise_http_blocksize()
+        import boto3
+        S3_CLIENT_CACHE['s3'] = boto3.client('s3')
+    return S3_CLIENT_CACHE['s3']
+
+class LazyS3Client:
+    """Stand-in for the module-level s3_client that defers boto3 until an S3 call is made."""
+    def __getattr__(self, name):
+        return getattr(get_s3_client(), name)
+
+s3_client = LazyS3Client()
+
+# Matches the x-amz-restore header, e.g. 'ongoing-request="false", expiry-date="..."'
+RESTORE_ONGOING_RE = re.compile(r'ongoing-request="(true|false)"')
+
+# One tree.txt branch per match: surrounding whitespace trimmed, blank and '#' lines skipped
+TREE_LINE_RE = re.compile(r'^[^\S\n]*(?!#)(\S.*?)[^\S\n]*$', re.M)
 
 # UI Formatting Constants
 STATUS_WIDTH = 13  # Length of "[NET: RSYNC]" is 12. We add 1 for spacing = 13.
@@ -138,10 +248,13 @@ STATUS_WIDTH = 13  # Length of "[NET: RSYNC]" is 12. We add 1 for spacing = 13.
 # --- HELPER FUNCTIONS ---
 
 class Heartbeat(threading.Thread):
-    def __init__(self, filepath=None, target_size=0, status="TAR", is_compressed=False):
+    def __init__(self, filepath=None, target_size=0, status="TAR", is_compressed=False, is_dir=False):
         super().__init__()
         self.daemon = True
         self.filepath = filepath
+        self.is_dir = is_dir
+        # Watched file held open so each poll is an fstat, not a path lookup (owned by run())
+        self.watch_fd, self.watch_path = None, None
         self.target_size = target_size
         self.status = status.replace(": LEAF", "").replace(":LEAF", "")
         self.is_compressed = is_compressed
@@ -162,11 +275,34 @@ class Heartbeat(threading.Thread):
         elif "NET" in s: self.verb_active, self.verb_past = "uploading", "uploaded"
         else: self.verb_active, self.verb_past = "processing", "processed"
 
+    def _current_size(self):
+        """Size of the watched output. Raises OSError while it does not exist yet."""
+        if self.is_dir:
+            return get_tree_size(self.filepath)
+
+        if self.watch_path != self.filepath:
+            self._close_watch()
+        if self.watch_fd is None:
+            self.watch_fd = os.open(self.filepath, os.O_RDONLY)
+            self.watch_path = self.filepath
+
+        st = os.fstat(self.watch_fd)
+        if st.st_nlink == 0:
+            # The path was replaced (e.g. written via rename); follow the new file
+            self._close_watch()
+            return self._current_size()
+        return st.st_size
+
+    def _close_watch(self):
+        if self.watch_fd is not None:
+            os.close(self.watch_fd)
+        self.watch_fd, self.watch_path = None, None
+
     def run(self):
         while not self.stop_signal.is_set():
-            if not self.paused and self.filepath and os.path.exists(self.filepath):
+            if not self.paused and self.filepath:
                 try:
-                    current = os.path.getsize(self.filepath)
+                    current = self._current_size()
                     now = time.time()
                     if (now - self.last_time) > 0.5:
                         self.speed = (current - self.last_size) / (now - self.last_time)
@@ -190,7 +326,9 @@ class Heartbeat(threading.Thread):
                     sys.stdout.write(f"\r{line:<120}")
                     sys.stdout.flush()
                 except: pass
-            time.sleep(0.1)
+            # Directory sizes need a full tree walk, so poll those at 1 Hz to stay out of tar's way
+            time.sleep(1.0 if self.is_dir else 0.1)
+        self._close_watch()
 
     def update_target(self, new_filepath, new_status=None, is_compressed=None, target_size=None):
         self.paused = True
@@ -246,68 +384,200 @@ class Heartbeat(threading.Thread):
         self.stop_signal.set()
         if self.is_alive(): self.join(timeout=1)
 
+class RingBuffer(io.TextIOBase):
+    """
+    Bounded stand-in for io.StringIO used by the cron muzzle.
+    Keeps only the last max_lines lines and collapses '\r' progress redraws to their final state.
+    """
+    def __init__(self, max_lines=5000):
+        super().__init__()
+        self.lines = deque(maxlen=max_lines)
+        self.partial = ""
+        self.dropped = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        chunks = (self.partial + text).split("\n")
+        self.partial = chunks.pop().rsplit("\r", 1)[-1]
+        for line in chunks:
+            if len(self.lines) == self.lines.maxlen:
+                self.dropped += 1
+            self.lines.append(line.rsplit("\r", 1)[-1])
+        return len(text)
+
+    def getvalue(self):
+        head = f"[... {self.dropped} earlier lines omitted ...]\n" if self.dropped else ""
+        body = "".join(line + "\n" for line in self.lines)
+        return head + body + self.partial
+
+SIZE_LABELS = ('', 'KB', 'MB', 'GB', 'TB')
+
 def format_bytes(size):
     """Converts raw bytes to human readable format."""
-    power = 2**10
-    n = size
-    power_labels = {0 : '', 1: 'KB', 2: 'MB', 3: 'GB', 4: 'TB'}
-    loop = 0
-    while n > power:
-        n /= power
-        loop += 1
-    return f"{n:.2f} {power_labels[loop]}"
-
-def get_metadata_hash(directory, recursive=True, file_list=None):
-    """Generates metadata hash with progress feedback and optimized excludes."""
-    exclude_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exclude.txt')
-    excludes = []
-    if os.path.exists(exclude_file):
-        with open(exclude_file, 'r') as f:
-            excludes = [line.strip().strip('/') for line in f if line.strip() and not line.startswith('#')]
+    # Scale = how many times size exceeds 1024 (a value of exactly 1024 stays in the lower unit)
+    idx = max(0, min(4, ((math.ceil(size) - 1).bit_length() - 1) // 10))
+    return f"{size / (1 << (idx * 10)):.2f} {SIZE_LABELS[idx]}"
+
+@functools.lru_cache(maxsize=4096)
+def parse_iso(iso_str):
+    """
+    datetime.fromisoformat, memoized: the leaves of one bag are committed together and
+    share a handful of last_upload strings. datetimes are immutable, so sharing is safe.
+    """
+    return datetime.fromisoformat(iso_str)
+
+def iso_to_epoch(iso_str):
+    """An inventory ISO timestamp as UNIX epoch seconds (parsed through parse_iso's cache)."""
+    return parse_iso(iso_str).timestamp()
+
+def ensure_dir(path):
+    """
+    mkdir -p, once per process. Only for directories that are never removed while running
+    (staging root, manifests, logs), since a deleted one would not be recreated.
+    """
+    if path not in ENSURED_DIRS:
+        os.makedirs(path, exist_ok=True)
+        ENSURED_DIRS.add(path)
+
+@functools.lru_cache(maxsize=None)
+def open_aws_log():
+    """The ledger file handle, opened in append mode on first use and kept for the run."""
+    ensure_dir(os.path.dirname(AWS_LOG_FILE))
+    return open(AWS_LOG_FILE, "a")
+
+def os_stat_or_none(path):
+    """os.stat for STAT_EXECUTOR workers on explicit file lists."""
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+def stat_or_none(entry):
+    """DirEntry.stat for STAT_EXECUTOR workers; unreadable files yield None and are skipped like before."""
+    try:
+        return entry.stat()
+    except OSError:
+        return None
+
+@functools.lru_cache(maxsize=None)
+def exclude_rules():
+    """The raw exclude.txt rules (as rsync takes them), read once per run; () without the file."""
+    if not os.path.exists(EXCLUDE_FILE):
+        return ()
+    with open(EXCLUDE_FILE, 'r') as f:
+        return tuple(line.strip() for line in f if line.strip() and not line.startswith('#'))
+
+@functools.lru_cache(maxsize=None)
+def exclude_regex():
+    """
+    Folds the slash-trimmed exclude rules into one alternation regex, so a path is
+    tested with a single C-level search instead of a Python loop over every pattern.
+    Returns None when there is nothing to exclude.
+    """
+    excludes = [rule.strip('/') for rule in exclude_rules()]
+    if not excludes:
+        return None
+    return re.compile("|".join(re.escape(exc) for exc in excludes))
+
+def walk_file_entries(directory, exclude_re=None, recursive=True):
+    """
+    os.scandir-based replacement for os.walk that yields (dir_path, [file DirEntry]).
+    Order matches os.walk with sorted dirs and files (a directory's files, then its
+    sub-directories depth first), so digests built from it are unchanged. The entry
+    that answered is_dir() is the one later stat()ed, so on filesystems without
+    d_type (e.g. SSHFS) a file costs one lookup instead of two.
+    Symlinked directories are listed as neither files nor descended, like os.walk.
+    """
+    stack = [directory]
+    while stack:
+        root = stack.pop()
+        try:
+            with os.scandir(root) as it:
+                entries = list(it)
+        except OSError:
+            continue
 
+        dirs, files = [], []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            (dirs if is_dir else files).append(entry)
+
+        files.sort(key=lambda e: e.name)
+        yield root, files
+
+        if recursive:
+            subdirs = sorted(
+                entry.path for entry in dirs
+                if not entry.is_symlink()
+                and not (exclude_re and exclude_re.search(entry.path))
+            )
+            stack.extend(reversed(subdirs))
+
+def get_metadata_hash(directory, recursive=True, file_list=None, path_sink=None, pbar=None, pre_stat=None):
+    """
+    Generates metadata hash with progress feedback and optimized excludes.
+    If path_sink is a list, the full path of every walked file is appended to it.
+    A caller hashing several leaves at once passes a shared pbar, which is left open.
+    pre_stat maps file_list names to stat results already taken (None = unreadable).
+    """
+    exclude_re = exclude_regex()
+
+    # MD5 stays: inventory.json stores these digests, and a new algorithm would mark every leaf changed.
+    # Records are batched into ~64 KiB updates; md5(a + b) == md5(a).update(b), so the digest is identical.
     hasher = hashlib.md5()
+    hash_buf = bytearray()
     total_size = 0
     file_count = 0
     
-    pbar = tqdm(desc="  Scanning metadata", unit=" files", leave=False)
+    own_pbar = pbar is None
+    if own_pbar:
+        pbar = tqdm(desc="  Scanning metadata", unit=" files", leave=False)
 
+    # Stats run concurrently on STAT_EXECUTOR; map() yields them back in submission
+    # order, so the hash input sequence (and therefore the digest) is unchanged.
     if file_list:
-        for name in sorted(file_list):
-            if any(exc in name for exc in excludes): continue
-            path = os.path.join(directory, name)
-            try:
-                stat = os.stat(path)
-                meta_str = f"{name}|{stat.st_size}|{stat.st_mtime}"
-                hasher.update(meta_str.encode('utf-8'))
+        names = [name for name in sorted(file_list) if not (exclude_re and exclude_re.search(name))]
+        if pre_stat is not None and all(name in pre_stat for name in names):
+            stats = [pre_stat[name] for name in names]
+        else:
+            stats = STAT_EXECUTOR.map(os_stat_or_none, [os.path.join(directory, name) for name in names])
+        for name, stat in zip(names, stats):
+            if stat is None: continue
+            meta_str = f"{name}|{stat.st_size}|{stat.st_mtime}"
+            hash_buf += meta_str.encode('utf-8')
+            if len(hash_buf) >= HASH_BATCH_BYTES:
+                hasher.update(hash_buf)
+                hash_buf.clear()
+            total_size += stat.st_size
+            file_count += 1
+            pbar.update(1)
+    else:
+        for root, files in walk_file_entries(directory, exclude_re, recursive):
+            if exclude_re:
+                files = [e for e in files if not exclude_re.search(e.path)]
+            if path_sink is not None:
+                path_sink.extend(entry.path for entry in files)
+
+            for entry, stat in zip(files, STAT_EXECUTOR.map(stat_or_none, files)):
+                if stat is None: continue
+                rel_path = os.path.relpath(entry.path, directory)
+                meta_str = f"{rel_path}|{stat.st_size}|{stat.st_mtime}"
+                hash_buf += meta_str.encode('utf-8')
+                if len(hash_buf) >= HASH_BATCH_BYTES:
+                    hasher.update(hash_buf)
+                    hash_buf.clear()
                 total_size += stat.st_size
                 file_count += 1
                 pbar.update(1)
-            except OSError: continue
-    else:
-        for root, dirs, files in os.walk(directory):
-            if excludes:
-                dirs[:] = [d for d in dirs if not any(exc in os.path.join(root, d) for exc in excludes)]
-            
-            if not recursive:
-                dirs[:] = []
-            
-            dirs.sort()
-            for name in sorted(files):
-                full_path = os.path.join(root, name)
-                if any(exc in full_path for exc in excludes):
-                    continue
-                    
-                try:
-                    stat = os.stat(full_path)
-                    rel_path = os.path.relpath(full_path, directory)
-                    meta_str = f"{rel_path}|{stat.st_size}|{stat.st_mtime}"
-                    hasher.update(meta_str.encode('utf-8'))
-                    total_size += stat.st_size
-                    file_count += 1
-                    pbar.update(1)
-                except OSError: continue
                 
-    pbar.close()
+    if own_pbar:
+        pbar.close()
+    hasher.update(hash_buf)
     return hasher.hexdigest(), total_size
 
 def generate_real_manifest(bag_name, leaf_definitions, is_live):
@@ -320,11 +590,10 @@ def generate_real_manifest(bag_name, leaf_definitions, is_live):
     manifest_path = os.path.join(MANIFEST_DIR, txt_name)
     s3_key = os.path.join(S3_PREFIX, "manifests", txt_name)
     
-    exclude_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exclude.txt')
-    excludes = [line.strip().strip('/') for line in open(exclude_file) if line.strip() and not line.startswith('#')] if os.path.exists(exclude_file) else []
+    exclude_re = exclude_regex()
 
     try:
-        if not os.path.exists(MANIFEST_DIR): os.makedirs(MANIFEST_DIR)
+        ensure_dir(MANIFEST_DIR)
         
         pbar = tqdm(desc=f"  Building Manifest", unit=" files", leave=False)
         
@@ -332,21 +601,25 @@ def generate_real_manifest(bag_name, leaf_definitions, is_live):
             f.write(f"# Manifest for {bag_name}\n")
             for leaf in leaf_definitions:
                 path = leaf['path']
+                # One write() and one progress update per directory rather than per file
                 if leaf.get('is_branch_root', False):
-                    for filename in leaf.get('files', []):
-                        f.write(f"{os.path.join(path, filename)}\n")
-                        pbar.update(1)
+                    lines = [f"{os.path.join(path, filename)}\n" for filename in leaf.get('files', [])]
+                    f.write("".join(lines))
+                    pbar.update(len(lines))
+                elif leaf.get('paths') is not None:
+                    # Reuse the file list gathered by the metadata scan
+                    lines = [f"{file_path}\n" for file_path in leaf['paths']]
+                    f.write("".join(lines))
+                    pbar.update(len(lines))
                 else:
-                    for root, dirs, files in os.walk(path):
-                        if excludes:
-                            dirs[:] = [d for d in dirs if not any(exc in os.path.join(root, d) for exc in excludes)]
-                        
-                        for name in files:
-                            full_path = os.path.join(root, name)
-                            if not any(exc in full_path for exc in excludes):
-                                f.write(f"{full_path}\n")
-                                pbar.update(1)
+                    for root, files in walk_file_entries(path, exclude_re):
+                        lines = [f"{entry.path}\n" for entry in files
+                                 if not (exclude_re and exclude_re.search(entry.path))]
+                        if lines:
+                            f.write("".join(lines))
+                            pbar.update(len(lines))
         pbar.close()
+        index_manifest(txt_name)
                             
         if is_live:
              s3_client.upload_file(manifest_path, S3_BUCKET, s3_key)
@@ -354,6 +627,33 @@ def generate_real_manifest(bag_name, leaf_definitions, is_live):
     except Exception as e:
         print(f"\n[WARN] Manifest failed: {e}")
 
+def delete_s3_keys(keys, action, aukive, bucket=None):
+    """
+    Deletes keys with DeleteObjects, up to 1000 per request instead of one round-trip each.
+    Every deleted key is logged; returns the keys S3 could not delete.
+    """
+    bucket = bucket or S3_BUCKET
+    failed = []
+    for i in range(0, len(keys), 1000):
+        batch = keys[i:i + 1000]
+        try:
+            response = s3_client.delete_objects(
+                Bucket=bucket, Delete={'Objects': [{'Key': k} for k in batch], 'Quiet': True})
+        except Exception as e:
+            print(f"  [WARN] Batch delete failed: {e}")
+            failed.extend(batch)
+            continue
+
+        # Quiet mode only reports failures
+        errors = {err['Key']: err.get('Message', err.get('Code')) for err in response.get('Errors', [])}
+        for key in batch:
+            if key in errors:
+                print(f"  [WARN] Failed to delete {key}: {errors[key]}")
+                failed.append(key)
+            else:
+                log_aws_transaction(action, key, 0, "N/A", response.get('ResponseMetadata', {}), aukive)
+    return failed
+
 def upload_system_artifacts():
     """Backs up the code, config, and brain to S3. Enforces a strict mirror (deletes old files)."""
     print("\n--- System Backup ---")
@@ -361,32 +661,32 @@ def upload_system_artifacts():
     # 1. Define the Canonical List of system files to backup
     sys_files = ["glacier.py", "prune.py", "glacier.cfg", DEFAULT_TREE_FILE, "inventory.json", "README.md", "requirements.txt", "exclude.txt"]
     
-    base_dir = os.path.dirname(os.path.abspath(__file__))
     s3_folder = os.path.join(S3_PREFIX, "system")
     
     # 2. THE SWEEP: Remove files on S3 that are no longer in our list
     try:
         # List what is currently on S3
-        current_s3_objs = s3_client.list_objects_v2(Bucket=S3_BUCKET, Prefix=s3_folder)
-        
-        if 'Contents' in current_s3_objs:
-            for obj in current_s3_objs['Contents']:
+        obsolete = []
+        paginator = s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=s3_folder):
+            for obj in page.get('Contents', []):
                 s3_key = obj['Key']
                 filename = os.path.basename(s3_key)
                 
                 # If the file on S3 is NOT in our authorized list, kill it.
                 if filename not in sys_files:
                     print(f"  [CLEANUP] Deleting obsolete file: {filename}")
-                    s3_client.delete_object(Bucket=S3_BUCKET, Key=s3_key)
-                    # We log this as a system cleanup
-                    log_aws_transaction("SYSTEM_PRUNE", s3_key, 0, "N/A", {}, "SYS-CLN")
+                    obsolete.append(s3_key)
+
+        # We log these as a system cleanup
+        delete_s3_keys(obsolete, "SYSTEM_PRUNE", "SYS-CLN")
                     
     except Exception as e:
         print(f"  [WARN] Failed to sweep system folder: {e}")
 
-    # 3. THE UPLOAD: Push the authorized files
-    for fname in sys_files:
-        local_path = os.path.join(base_dir, fname)
+    # 3. THE UPLOAD: Push the authorized files (concurrently; each upload is a latency-bound round-trip)
+    def upload_one(fname):
+        local_path = os.path.join(BASE_DIR, fname)
         if os.path.exists(local_path): 
             s3_key = os.path.join(s3_folder, fname)
             print(f"  [UPLOADING] {fname}...")
@@ -396,6 +696,9 @@ def upload_system_artifacts():
             except Exception as e:
                 print(f"  [WARN] Failed to upload {fname}: {e}")
 
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(upload_one, sys_files))
+
 def mount_remote_branch(branch_string):
     if ":" not in branch_string:
         return os.path.abspath(branch_string), None
@@ -452,8 +755,14 @@ def generate_summary(inventory, run_stats, is_live):
 
     for branch, data in inventory.get("branches", {}).items():
         leaves = data.get("leaves", {})
-        branch_size = sum(l.get("size_bytes", 0) for l in leaves.values())
-        unique_bags = set(l.get("tar_id") for l in leaves.values() if l.get("tar_id"))
+        # One pass over the leaf records for both the size total and the bag set
+        branch_size = 0
+        unique_bags = set()
+        for l in leaves.values():
+            branch_size += l.get("size_bytes", 0)
+            tar_id = l.get("tar_id")
+            if tar_id:
+                unique_bags.add(tar_id)
         num_bags = len(unique_bags)
     
         total_cap = num_bags * TARGET_SIZE_BYTES        
@@ -504,9 +813,10 @@ def generate_summary(inventory, run_stats, is_live):
 def construct_tar_command(tar_path, leaf_list, branch_root, designator, passphrase_file, branch_leaves, remote_conn, remote_base_path, excludes=None, encryption_config=None, hb=None):
     """
     Constructs a tar command to archive leaves, handling encryption and compression as specified.
+    The command is an argv list, run without a shell, so paths need no quoting.
     
     Returns:
-        tuple: (command string, list of temporary files to clean up)
+        tuple: (argv list, list of temporary files to clean up)
     """
     # 1. Build exclude arguments
     exclude_args = build_exclude_arguments(excludes)
@@ -541,23 +851,20 @@ def build_exclude_arguments(excludes=None):
         excludes: List of patterns to exclude
         
     Returns:
-        str: Formatted exclude flags for tar command
+        list: Exclude flags for the tar argv
     """
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    exclude_path = os.path.join(base_dir, "exclude.txt")
     exclude_args = []
     
     # Add standard exclude file if it exists
-    if os.path.exists(exclude_path):
-        exclude_args.append(f"--exclude-from={shlex.quote(exclude_path)}")
+    if os.path.exists(EXCLUDE_FILE):
+        exclude_args.append(f"--exclude-from={EXCLUDE_FILE}")
     
     # Add custom excludes if provided
     if excludes:
         for ex in excludes:
-            exclude_args.append(f"--exclude {shlex.quote(ex)}")
+            exclude_args.extend(["--exclude", ex])
     
-    # Join all exclude arguments with spaces
-    return " ".join(exclude_args)
+    return exclude_args
 
 
 def process_leaves_for_tar(leaf_list, branch_root, designator, passphrase_file, branch_leaves, 
@@ -638,7 +945,7 @@ def process_encrypted_leaf(leaf, branch_root, rel_path, passphrase_file, needs_c
                           remote_conn, remote_base_path, branch_leaves, tar_sequence, 
                           temp_files_to_clean, encryption_config, hb=None):
     """Process a leaf that needs encryption."""
-    suffix = ".gz.gpg" if needs_compress else ".gpg"
+    suffix = f"{COMPRESS_EXT}.gpg" if needs_compress else ".gpg"
     inner_name = "__BRANCH_ROOT__" + suffix if leaf['is_branch_root'] else f"{rel_path}{suffix}"
     
     cluster_files = leaf['files'] if leaf['is_branch_root'] else None
@@ -660,16 +967,16 @@ def process_encrypted_leaf(leaf, branch_root, rel_path, passphrase_file, needs_c
         temp_files_to_clean.append(temp_file)
         base_tmp = os.path.basename(temp_file)
         transform_expr = f"s#{base_tmp}#{inner_name}#"
-        arg = f"--transform={shlex.quote(transform_expr)} {shlex.quote(base_tmp)}"
-        tar_sequence.append((STAGING_DIR, arg))
-        branch_leaves[leaf['key']]['encrypted'] = True
-        branch_leaves[leaf['key']]['compressed'] = needs_compress
+        tar_sequence.append((STAGING_DIR, [f"--transform={transform_expr}", base_tmp]))
+        with INVENTORY_LOCK:
+            branch_leaves[leaf['key']]['encrypted'] = True
+            branch_leaves[leaf['key']]['compressed'] = needs_compress
 
 
 def process_compressed_leaf(leaf, branch_root, rel_path, remote_conn, remote_base_path,
                            branch_leaves, tar_sequence, temp_files_to_clean, hb=None):
     """Process a leaf that needs compression but not encryption."""
-    inner_name = "__BRANCH_ROOT__.tar.gz" if leaf['is_branch_root'] else f"{rel_path}.tar.gz"
+    inner_name = f"__BRANCH_ROOT__.tar{COMPRESS_EXT}" if leaf['is_branch_root'] else f"{rel_path}.tar{COMPRESS_EXT}"
     cluster_files = leaf['files'] if leaf['is_branch_root'] else None
     
     temp_file = compress_leaf(
@@ -686,23 +993,24 @@ def process_compressed_leaf(leaf, branch_root, rel_path, remote_conn, remote_bas
         temp_files_to_clean.append(temp_file)
         base_tmp = os.path.basename(temp_file)
         transform_expr = f"s#{base_tmp}#{inner_name}#"
-        arg = f"--transform={shlex.quote(transform_expr)} {shlex.quote(base_tmp)}"
-        tar_sequence.append((STAGING_DIR, arg))
-        branch_leaves[leaf['key']]['compressed'] = True
-        branch_leaves[leaf['key']]['encrypted'] = False
+        tar_sequence.append((STAGING_DIR, [f"--transform={transform_expr}", base_tmp]))
+        with INVENTORY_LOCK:
+            branch_leaves[leaf['key']]['compressed'] = True
+            branch_leaves[leaf['key']]['encrypted'] = False
 
 
 def process_standard_leaf(leaf, branch_root, branch_leaves, tar_sequence):
     """Process a leaf that needs neither encryption nor compression."""
-    branch_leaves[leaf['key']]['encrypted'] = False
-    branch_leaves[leaf['key']]['compressed'] = False
+    with INVENTORY_LOCK:
+        branch_leaves[leaf['key']]['encrypted'] = False
+        branch_leaves[leaf['key']]['compressed'] = False
     
     if leaf['is_branch_root']:
         for f in leaf['files']: 
-            tar_sequence.append((branch_root, shlex.quote(f)))
+            tar_sequence.append((branch_root, [f]))
     else:
         rel_path = os.path.relpath(leaf['path'], branch_root)
-        tar_sequence.append((branch_root, shlex.quote(rel_path)))
+        tar_sequence.append((branch_root, [rel_path]))
 
 
 def optimize_tar_arguments(tar_sequence):
@@ -715,28 +1023,31 @@ def optimize_tar_arguments(tar_sequence):
     optimized_args = []
     current_context = None
     
-    for context, arg in tar_sequence:
+    for context, args in tar_sequence:
         if context != current_context:
-            optimized_args.append(f"-C {shlex.quote(context)}")
+            optimized_args.extend(["-C", context])
             current_context = context
-        optimized_args.append(arg)
+        optimized_args.extend(args)
     
     return optimized_args
 
 
+@functools.lru_cache(maxsize=None)
+def is_gnu_tar():
+    """Whether the tar on PATH is GNU tar (checked once per run rather than once per bag)."""
+    return "GNU" in subprocess.getoutput("tar --version")
+
 def generate_final_tar_command(tar_path, exclude_flag, optimized_args):
     """
-    Generate the final tar command string.
+    Generate the final tar argv.
     
     Returns:
-        str: Complete tar command
+        list: Complete tar command
     """
     # Check if GNU tar is available for sparse file support
-    is_gnu = "GNU" in subprocess.getoutput("tar --version")
-    sparse_flag = "-S" if is_gnu else ""
+    sparse_flag = ["-S"] if is_gnu_tar() else []
 
-    cmd = f"tar {sparse_flag} {exclude_flag} -cf {shlex.quote(tar_path)} {' '.join(optimized_args)}"    
-    return cmd
+    return ["tar", "-b", str(TAR_BLOCKING_FACTOR), *sparse_flag, *exclude_flag, "-cf", tar_path, *optimized_args]
 
 def process_bag(bag_num, leaf_list, branch_root, short_name, bag_size_bytes, is_live, branch_leaves, hostname, branch_stats, upload_limit_mb, designator, passphrase_file, remote_conn, remote_base_path, inventory, excludes=None, encryption_config=None):
     """
@@ -789,7 +1100,7 @@ def process_bag(bag_num, leaf_list, branch_root, short_name, bag_size_bytes, is_
         return
 
     # 8. Build and upload the bag
-    etag = build_and_upload_bag(
+    etag, checksum = build_and_upload_bag(
         tar_path, leaf_list, branch_root, designator, passphrase_file,
         branch_leaves, remote_conn, remote_base_path, excludes,
         s3_key, S3_BUCKET, bag_size_bytes, upload_limit_mb, 
@@ -798,7 +1109,7 @@ def process_bag(bag_num, leaf_list, branch_root, short_name, bag_size_bytes, is_
     
     # 9. Update inventory after successful upload
     
-    commit_to_inventory(leaf_list, branch_leaves, inventory, is_live, bag_num, etag)
+    commit_to_inventory(leaf_list, branch_leaves, inventory, is_live, bag_num, etag, checksum)
 
 
 def prepare_bag_info(bag_num, short_name, hostname):
@@ -832,11 +1143,15 @@ def generate_bag_manifest(tar_name, leaf_list, branch_root, is_live):
         if leaf['is_branch_root']:
             manifest_leaves.append({'path': branch_root, 'is_branch_root': True, 'files': leaf['files']})
         else:
-            manifest_leaves.append({'path': leaf['path'], 'is_branch_root': False})
+            manifest_leaves.append({'path': leaf['path'], 'is_branch_root': False,
+                                    'paths': leaf.pop('manifest_paths', None)})
     
     generate_real_manifest(tar_name, manifest_leaves, is_live)
 
 
+# Shared read-only default for leaves missing from the inventory
+EMPTY_LEAF = {}
+
 def should_upload_bag(leaf_list, branch_leaves):
     """
     Check if any leaf in the bag needs to be uploaded.
@@ -844,17 +1159,15 @@ def should_upload_bag(leaf_list, branch_leaves):
     Returns:
         bool: True if upload is needed, False otherwise
     """
-    for leaf in leaf_list:
-        key = leaf['key']
-        if branch_leaves.get(key, {}).get('needs_upload', True):
-            return True
-    return False
+    # any() stops at the first leaf that needs work; EMPTY_LEAF avoids a throwaway dict per miss
+    return any(branch_leaves.get(leaf['key'], EMPTY_LEAF).get('needs_upload', True) for leaf in leaf_list)
 
 
 def update_skip_stats(branch_stats, bag_size_bytes):
     """Update branch stats for skipped bags."""
-    branch_stats['skip_count'] += 1
-    branch_stats['skip_bytes'] += bag_size_bytes
+    with INVENTORY_LOCK:
+        branch_stats['skip_count'] += 1
+        branch_stats['skip_bytes'] += bag_size_bytes
 
 
 def print_skip_message(tar_name):
@@ -867,15 +1180,18 @@ def print_skip_message(tar_name):
 
 def update_upload_stats(branch_stats, bag_size_bytes):
     """Update branch stats for bags that will be uploaded."""
-    branch_stats['up_count'] += 1
-    branch_stats['up_bytes'] += bag_size_bytes
+    with INVENTORY_LOCK:
+        branch_stats['up_count'] += 1
+        branch_stats['up_bytes'] += bag_size_bytes
 
 
 def update_inventory_locations(leaf_list, branch_leaves, s3_key):
     """Update inventory with expected S3 locations for all leaves in the bag."""
-    for leaf in leaf_list:
-        if leaf['key'] in branch_leaves:
-            branch_leaves[leaf['key']]['archive_key'] = s3_key
+    with INVENTORY_LOCK:
+        for leaf in leaf_list:
+            entry = branch_leaves.get(leaf['key'])
+            if entry is not None:
+                entry['archive_key'] = s3_key
 
 
 def print_dry_run_message(tar_name, s3_key, s3_bucket):
@@ -889,31 +1205,30 @@ def build_and_upload_bag(tar_path, leaf_list, branch_root, designator, passphras
                         branch_leaves, remote_conn, remote_base_path, excludes,
                         s3_key, s3_bucket, bag_size_bytes, upload_limit_mb, 
                         encryption_config):
-    """Build the tar archive and upload it to S3."""
-    # 1. Ensure staging directory exists
-    if not os.path.exists(STAGING_DIR): 
-        os.makedirs(STAGING_DIR)
+    """Build the tar archive and stream it straight into S3 (the outer .tar never touches STAGING_DIR)."""
+    # 1. Ensure staging directory exists (still used for compressed/encrypted leaf files)
+    ensure_dir(STAGING_DIR)
     
-    # 2. Build tar archive
-    temp_files_to_clean = build_tar_archive(
+    # 2. Prepare leaves and the tar command that writes the bag to stdout
+    cmd, temp_files_to_clean = build_tar_archive(
         tar_path, leaf_list, branch_root, designator, passphrase_file,
         branch_leaves, remote_conn, remote_base_path, excludes, 
         bag_size_bytes, encryption_config
     )
     
     try:
-        # 3. Upload to S3
-        etag = upload_to_s3(
-            tar_path, s3_bucket, s3_key, bag_size_bytes, upload_limit_mb
+        # 3. Pipe tar into a multipart upload
+        etag, checksum = stream_tar_to_s3(
+            cmd, s3_bucket, s3_key, bag_size_bytes, upload_limit_mb
         )
         
         # 4. Log the upload
-        log_upload_success(s3_key, tar_path, etag)
+        log_upload_success(s3_key, etag)
         
         # 5. Cleanup
         cleanup_files(tar_path, temp_files_to_clean)
         
-        return etag
+        return etag, checksum
         
     except Exception as e:
         # THIS IS THE BLOCK THAT WAS MISSING, PREVENTING THE SCRIPT FROM RUNNING
@@ -924,85 +1239,197 @@ def build_and_upload_bag(tar_path, leaf_list, branch_root, designator, passphras
 def build_tar_archive(tar_path, leaf_list, branch_root, designator, passphrase_file,
                      branch_leaves, remote_conn, remote_base_path, excludes, 
                      bag_size_bytes, encryption_config):
-    """Build the tar archive containing all leaves."""
+    """
+    Prepares every leaf of the bag and returns the tar command that streams the bag to stdout.
+
+    Returns:
+        tuple: (argv list, list of temporary files to clean up)
+    """
     
     # UI Setup
     bag_label_str = "  > Bag"
     pad_width = STATUS_WIDTH + 2
     print(f"{bag_label_str:<{pad_width}}: {os.path.basename(tar_path)}")
     
-    # Start Heartbeat for the whole process
+    # Start Heartbeat for the leaf stages
     hb = Heartbeat(tar_path, bag_size_bytes, status="BAG: TAR")
     hb.start()
 
     try:
-        # 1. Process Child Leaves (Indented 7 spaces)
+        # 1. Process Child Leaves (Indented 7 spaces); "-" sends the archive to stdout
         cmd, temp_files_to_clean = construct_tar_command(
-            tar_path, leaf_list, branch_root, designator, passphrase_file,
+            "-", leaf_list, branch_root, designator, passphrase_file,
             branch_leaves, remote_conn, remote_base_path, excludes, 
             encryption_config, hb=hb
         )
-
-        # 2. Transition back to Bag Level (Indented 5 spaces)
-        sys.stdout.write("\n") 
-        hb.update_target(tar_path, new_status="BAG: TAR", target_size=bag_size_bytes)
-        
-        # 3. Final Packaging
-        subprocess.run(cmd, shell=True, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
-        
-        hb.snap_done()
+    finally:
         hb.stop()
-        return temp_files_to_clean
 
-    except subprocess.CalledProcessError as e:
-        hb.stop()
-        print(f"\n[FATAL] Tar failed: {e.stderr.decode() if e.stderr else str(e)}")
-        raise e
+    # 2. Transition back to Bag Level (Indented 5 spaces)
+    sys.stdout.write("\n")
+    return cmd, temp_files_to_clean
+
+def grow_pipe(pipe, size=HTTP_BLOCKSIZE):
+    """Best-effort: enlarge a pipe's kernel buffer (Linux only) so whole tar records fit in it."""
+    try:
+        import fcntl
+        fcntl.fcntl(pipe.fileno(), getattr(fcntl, "F_SETPIPE_SZ", 1031), size)
+    except (ImportError, OSError):
+        pass
+
+# Part uploads in flight per bag; each one holds a whole part in memory until S3 acknowledges it.
+# Fewer run when upload_buffer_mb cannot hold this many parts of the bag's size.
+UPLOAD_WORKERS = 10
 
-def upload_to_s3(tar_path, s3_bucket, s3_key, file_size, upload_limit_mb):
+# One part-upload pool for the whole run, sized so every bag that can be in flight at once gets
+# its UPLOAD_WORKERS; shut down at the end of main()
+UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS * PARALLEL_BAGS * PARALLEL_BRANCHES, thread_name_prefix="upload")
+
+class UploadThrottle:
     """
-    Upload the tar file to S3 with progress tracking.
+    Caps the combined rate of the part uploads sharing it: each part reserves the next
+    slot on one schedule and sleeps until it comes up before it is sent.
     """
-    if upload_limit_mb > 0:
-        t_config = TransferConfig(max_bandwidth=upload_limit_mb * 1024 * 1024, max_concurrency=10, use_threads=True)
-    else:
-        t_config = TransferConfig(use_threads=True)
+    def __init__(self, limit_mb):
+        self.rate = limit_mb * 1024 * 1024
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self, nbytes):
+        with self.lock:
+            now = time.monotonic()
+            start = max(self.next_slot, now)
+            self.next_slot = start + nbytes / self.rate
+        time.sleep(start - now)
+
+@functools.lru_cache(maxsize=None)
+def get_upload_throttle(upload_limit_mb):
+    """One throttle per bandwidth limit for the whole run, so bags uploading in parallel share upload_limit_mb."""
+    return UploadThrottle(upload_limit_mb) if upload_limit_mb > 0 else None
+
+def upload_stream_part(s3_bucket, s3_key, upload_id, part_number, data, throttle):
+    """Uploads one part with its SHA-256 and returns the entry complete_multipart_upload expects for it."""
+    if throttle:
+        throttle.wait(len(data))
+    response = s3_client.upload_part(
+        Bucket=s3_bucket, Key=s3_key, UploadId=upload_id, PartNumber=part_number,
+        Body=data, ChecksumAlgorithm='SHA256'
+    )
+    return {'PartNumber': part_number, 'ETag': response['ETag'], 'ChecksumSHA256': response['ChecksumSHA256']}
 
+def upload_stream_parts(stream, s3_bucket, s3_key, upload_id, chunk_size, throttle, progress):
+    """
+    Reads the stream in chunk_size parts and uploads them on UPLOAD_EXECUTOR. Parts read but not
+    yet uploaded fit in upload_buffer_mb (one part at minimum, UPLOAD_WORKERS at most),
+    so RAM stays bounded however large the bag. Stops reading at the first failed part.
+
+    Returns:
+        list: Part entries for complete_multipart_upload (raises the first part error)
+    """
+    max_parts = min(UPLOAD_WORKERS, max(1, UPLOAD_BUFFER_MB * 1024 * 1024 // chunk_size))
+    in_flight = threading.BoundedSemaphore(max_parts)
+    # progress is called once per finished part, from whichever worker finished it
+    progress_lock = threading.Lock()
+    failed = []
+    futures = []
+
+    def part_done(size, future):
+        in_flight.release()
+        if future.exception() is None:
+            with progress_lock:
+                progress(size)
+        else:
+            failed.append(future)
+
+    try:
+        while not failed:
+            in_flight.acquire()
+            data = stream.read(chunk_size)
+            # A multipart upload needs at least one part, even an empty one
+            if not data and futures:
+                in_flight.release()
+                break
+            future = UPLOAD_EXECUTOR.submit(upload_stream_part, s3_bucket, s3_key, upload_id, len(futures) + 1, data, throttle)
+            future.add_done_callback(functools.partial(part_done, len(data)))
+            futures.append(future)
+    finally:
+        # No part may still be running once the caller completes or aborts the upload
+        wait(futures)
+    return [future.result() for future in futures]
+
+def stream_tar_to_s3(cmd, s3_bucket, s3_key, bag_size_bytes, upload_limit_mb):
+    """
+    Runs the bag's tar command and uploads its stdout to S3 as a multipart upload,
+    so packaging and upload overlap and no staging copy of the bag is written.
+    The upload is completed only after tar exits 0; otherwise it is aborted and
+    CalledProcessError is raised, leaving any existing object under s3_key untouched.
+
+    Returns:
+        tuple: (ETag, S3's SHA-256 checksum of the object)
+    """
+    # The stream length is unknown up front; size parts so even a bag 25% over its
+    # estimate stays under S3's 10,000-part limit.
+    chunk_size = max(STREAM_CHUNK_BYTES, -(-int(bag_size_bytes * 1.25) // 9000))
 
     # UI Indent (5 spaces) to match the "> Bag" level
-    # desc = "     " + "[NET: AWS]".ljust(STATUS_WIDTH)
     desc = f"{' ' * 5}[NET: AWS]".ljust(15)
-    file_size = os.path.getsize(tar_path)
-        
-    with tqdm(
-        total=file_size,
-        unit='B',
-        unit_scale=True,
-        leave=True,
-        ncols=100,
-        bar_format="{desc}{percentage:5.1f}%|{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]"
-    ) as pbar:
-        pbar.set_description(desc)
-        s3_client.upload_file(
-            tar_path, 
-            s3_bucket, 
-            s3_key, 
-            ExtraArgs={'StorageClass': 'DEEP_ARCHIVE'},
-            Config=t_config,
-            Callback=lambda bytes_transferred: pbar.update(bytes_transferred)
+
+    # S3 checks a SHA-256 per part and stores the checksum-of-checksums with the object
+    upload_id = s3_client.create_multipart_upload(
+        Bucket=s3_bucket, Key=s3_key, StorageClass='DEEP_ARCHIVE', ChecksumAlgorithm='SHA256'
+    )['UploadId']
+    try:
+        # tar's stderr goes to a file: a chatty run must not fill a pipe nobody reads mid-upload
+        with tempfile.TemporaryFile() as tar_stderr:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=tar_stderr)
+            grow_pipe(proc.stdout)
+            try:
+                with tqdm(
+                    total=bag_size_bytes,
+                    unit='B',
+                    unit_scale=True,
+                    leave=True,
+                    ncols=100,
+                    bar_format="{desc}{percentage:5.1f}%|{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]"
+                ) as pbar:
+                    pbar.set_description(desc)
+                    parts = upload_stream_parts(
+                        proc.stdout, s3_bucket, s3_key, upload_id, chunk_size,
+                        get_upload_throttle(upload_limit_mb), pbar.update
+                    )
+            finally:
+                proc.stdout.close()
+                returncode = proc.wait()
+
+            if returncode != 0:
+                tar_stderr.seek(0)
+                err_text = tar_stderr.read().decode(errors='replace')
+                print(f"\n[FATAL] Tar failed: {err_text or returncode}")
+                raise subprocess.CalledProcessError(returncode, cmd, stderr=err_text)
+
+        # Nothing is visible under s3_key until this call, so a failed run never replaces a good bag
+        s3_client.complete_multipart_upload(
+            Bucket=s3_bucket, Key=s3_key, UploadId=upload_id, MultipartUpload={'Parts': parts}
         )
-    
-    # Verify upload and get ETag
-    response = s3_client.head_object(Bucket=s3_bucket, Key=s3_key)
+    except BaseException:
+        try:
+            s3_client.abort_multipart_upload(Bucket=s3_bucket, Key=s3_key, UploadId=upload_id)
+        except Exception as e:
+            print(f"[WARN] Could not abort multipart upload for {s3_key}: {e}")
+        raise
+
+    # Verify upload and get ETag + checksum
+    response = s3_client.head_object(Bucket=s3_bucket, Key=s3_key, ChecksumMode='ENABLED')
     etag = response.get('ETag', '').replace('"', '')
     
-    return etag
+    return etag, response.get('ChecksumSHA256')
 
-def log_upload_success(s3_key, tar_path, etag):
+def log_upload_success(s3_key, etag):
     """Log successful upload to the transaction log."""
+    file_size = 0
     try:
-        file_size = os.path.getsize(tar_path)
         response = s3_client.head_object(Bucket=S3_BUCKET, Key=s3_key)
+        file_size = response.get('ContentLength', 0)
         metadata = response.get('ResponseMetadata', {})
         
         log_aws_transaction(
@@ -1026,7 +1453,7 @@ def log_upload_success(s3_key, tar_path, etag):
         log_aws_transaction(
             "VERIFY_FAILURE", 
             s3_key, 
-            os.path.getsize(tar_path), 
+            file_size, 
             "N/A", 
             {"Error": str(e)}, 
             "ERR-VFY"
@@ -1046,21 +1473,27 @@ def cleanup_files(tar_path, temp_files_to_clean):
         if os.path.exists(f):
             os.remove(f)
 
-def commit_to_inventory(leaf_list, branch_leaves, inventory, is_live, bag_num, etag=None):
+def commit_to_inventory(leaf_list, branch_leaves, inventory, is_live, bag_num, etag=None, checksum=None):
     """Update inventory with successful upload information."""
     # Update local manifest/inventory
-    for leaf in leaf_list:
-        key = leaf['key']
-        if key in branch_leaves:
-            branch_leaves[key]['needs_upload'] = False
-            branch_leaves[key]['last_upload'] = datetime.now().isoformat()
-            branch_leaves[key]['etag'] = etag  # etag needs to be passed in or returned from upload_to_s3
+    upload_iso = datetime.now().isoformat()
+    with INVENTORY_LOCK:
+        for leaf in leaf_list:
+            key = leaf['key']
+            if key in branch_leaves:
+                branch_leaves[key]['needs_upload'] = False
+                branch_leaves[key]['last_upload'] = upload_iso
+                branch_leaves[key]['etag'] = etag  # etag is returned by stream_tar_to_s3
+                if checksum:
+                    branch_leaves[key]['checksum_sha256'] = checksum
+                else:
+                    branch_leaves[key].pop('checksum_sha256', None)
+        note_bag_commit(inventory, branch_leaves, upload_iso)
 
-    # Save inventory to disk
+    # Save inventory to disk (the branch summary is already current, so no full walk)
     if is_live:
         try:
-            with open(INVENTORY_FILE, 'w') as f:
-                json.dump(inventory, f, indent=4)
+            save_inventory(inventory, summarize=False)
             
             inv_name = os.path.basename(INVENTORY_FILE)            
             save_header = f"{' ' * 5}[SAVE: DB]"
@@ -1076,6 +1509,10 @@ def commit_to_inventory(leaf_list, branch_leaves, inventory, is_live, bag_num, e
 def process_branch(branch_line, inventory, run_stats, is_live, upload_limit_mb, is_repack, passphrase_file, encryption_config=None):
     """Handles parsing types (MUTABLE, IMMUTABLE), mounting, and processing."""
     
+    # Empty the staging directory before the first live branch of this run
+    if is_live:
+        cleanup_staging_once()
+
     # Parse branch info
     branch_path, full_tags, logic_type, branch_excludes = parse_branch_line(branch_line)
     
@@ -1098,9 +1535,10 @@ def process_branch(branch_line, inventory, run_stats, is_live, upload_limit_mb,
         print_branch_header(branch_path, full_tags)
 
         # Initialize branch in inventory if needed
-        if branch_line not in inventory["branches"]:
-            inventory["branches"][branch_line] = {"leaves": {}}
-        branch_leaves = inventory["branches"][branch_line]["leaves"]
+        with INVENTORY_LOCK:
+            if branch_line not in inventory["branches"]:
+                inventory["branches"][branch_line] = {"leaves": {}}
+            branch_leaves = inventory["branches"][branch_line]["leaves"]
 
         # Identify leaves based on logic type
         found_leaves = identify_leaves(logic_type, scan_path, branch_excludes)
@@ -1110,8 +1548,11 @@ def process_branch(branch_line, inventory, run_stats, is_live, upload_limit_mb,
         # Scan metadata and update inventory
         leaves_to_bag = scan_and_update_inventory(found_leaves, branch_leaves, is_repack)
 
-        # Assign bags to leaves
-        bag_counter = assign_bags_to_leaves(leaves_to_bag, inventory, branch_leaves, is_repack)
+        # Assign bags to leaves (bag numbers are global, so one branch at a time)
+        with INVENTORY_LOCK:
+            bag_counter = assign_bags_to_leaves(leaves_to_bag, inventory, branch_leaves, is_repack)
+            # The scan and assignment changed sizes and tar_ids; bag commits after this only move last_upload
+            inventory["branches"][branch_line]['_summary'] = compute_branch_summary(branch_leaves)
 
         # Group by bag ID
         bags = group_leaves_by_bag(leaves_to_bag)
@@ -1129,9 +1570,19 @@ def process_branch(branch_line, inventory, run_stats, is_live, upload_limit_mb,
         if is_repack and is_live:
             handle_repack_cleanup(hostname, short_name, bag_counter, s3_client, S3_BUCKET, S3_PREFIX)
 
-        # Update branch scan timestamp
-        if branch_line in inventory["branches"]:
-            inventory["branches"][branch_line]["last_scan"] = datetime.now().isoformat()
+        # Update branch scan timestamp. It is saved right away (a branch with nothing to upload
+        # has no bag commit to carry it), and the cron stamp is only written once it is on disk.
+        with INVENTORY_LOCK:
+            if branch_line in inventory["branches"]:
+                inventory["branches"][branch_line]["last_scan"] = datetime.now().isoformat()
+                if is_live:
+                    try:
+                        save_inventory(inventory, summarize=False)
+                    except Exception as e:
+                        save_header = f"{' ' * 5}[WARN]"
+                        print(f"{save_header:<15}: Failed to save scan time to {os.path.basename(INVENTORY_FILE)}: {e}")
+                    else:
+                        record_last_scan(branch_line, inventory["branches"][branch_line]["last_scan"])
 
     finally:
         if mount_point_to_cleanup:
@@ -1206,26 +1657,29 @@ def identify_leaves(logic_type, scan_path, branch_excludes):
     elif logic_type == "MUTABLE":
         # Shared Storage: Every sub-directory is a unique Leaf.
         try:
-            # Filter subdirs immediately
-            subdirs = [d for d in sorted(os.listdir(scan_path)) 
-                       if os.path.isdir(os.path.join(scan_path, d)) 
-                       and d not in branch_excludes]
+            # One directory read; DirEntry answers is_dir/is_file from d_type without a stat.
+            # Symlinks are still followed, as os.path.isdir/isfile did, so leaf keys are unchanged.
+            with os.scandir(scan_path) as it:
+                entries = sorted((e for e in it if e.name not in branch_excludes), key=lambda e: e.name)
 
-            for d in subdirs:
-                full_p = os.path.join(scan_path, d)
-                found_leaves.append({
-                    "key": full_p, "path": full_p, "is_branch_root": False, "files": []
-                })
+            # Filter subdirs immediately
+            for entry in entries:
+                if entry.is_dir():
+                    found_leaves.append({
+                        "key": entry.path, "path": entry.path, "is_branch_root": False, "files": []
+                    })
             
             # Filter loose files immediately
-            loose_files = [f for f in sorted(os.listdir(scan_path)) 
-                           if os.path.isfile(os.path.join(scan_path, f))
-                           and f not in branch_excludes]
+            loose_entries = [entry for entry in entries if entry.is_file()]
 
-            if loose_files:
+            if loose_entries:
+                # Stat through the DirEntry: where is_file() already had to stat (symlinks, filesystems
+                # without d_type) the result is cached, and the metadata hash reuses these instead of re-statting
+                loose_files = [entry.name for entry in loose_entries]
                 cluster_key = os.path.join(scan_path, "__BRANCH_ROOT__")
                 found_leaves.append({
-                    "key": cluster_key, "path": scan_path, "is_branch_root": True, "files": loose_files
+                    "key": cluster_key, "path": scan_path, "is_branch_root": True, "files": loose_files,
+                    "pre_stat": dict(zip(loose_files, STAT_EXECUTOR.map(stat_or_none, loose_entries)))
                 })
         except OSError as e:
             print(f"[ERROR] Could not scan directory {scan_path}: {e}")
@@ -1238,45 +1692,100 @@ def identify_leaves(logic_type, scan_path, branch_excludes):
 
 
 def scan_and_update_inventory(found_leaves, branch_leaves, is_repack):
-    """Scan metadata for leaves and update the inventory."""
-    leaves_to_bag = []
+    """Scan metadata for leaves and update the inventory; found_leaves is completed in place and returned."""
 
-    for leaf in found_leaves:
+    # Hash outside the lock; only the inventory writes below are serialized
+    cache_budget = [MANIFEST_CACHE_FILES]
+    budget_lock = threading.Lock()
+    pbar = tqdm(desc="  Scanning metadata", unit=" files", leave=False)
+
+    def scan_leaf(leaf):
         if leaf['is_branch_root']:
-            current_hash, size = get_metadata_hash(leaf['path'], recursive=False, file_list=leaf['files'])
-        else:
-            current_hash, size = get_metadata_hash(leaf['path'], recursive=True)
+            return get_metadata_hash(leaf['path'], recursive=False, file_list=leaf['files'], pbar=pbar,
+                                     pre_stat=leaf.get('pre_stat'))
+
+        # Keep the walked paths for the bag manifest while within budget; past it the manifest walks again
+        paths = [] if cache_budget[0] > 0 else None
+        result = get_metadata_hash(leaf['path'], recursive=True, path_sink=paths, pbar=pbar)
+        if paths is not None:
+            with budget_lock:
+                cache_budget[0] -= len(paths)
+                if cache_budget[0] >= 0:
+                    leaf['manifest_paths'] = paths
+        return result
+
+    # Leaves are independent subtrees; walking several at once hides per-directory latency on remote mounts.
+    # map() returns results in leaf order, so the inventory update below is unchanged.
+    with ThreadPoolExecutor(max_workers=LEAF_SCAN_WORKERS, thread_name_prefix="leafscan") as ex:
+        scanned = list(ex.map(scan_leaf, found_leaves))
+    pbar.close()
+
+    with INVENTORY_LOCK:
+        for leaf, (current_hash, size) in zip(found_leaves, scanned):
+            update_leaf_entry(leaf, current_hash, size, branch_leaves, is_repack)
+
+    return found_leaves
 
-        entry = branch_leaves.get(leaf['key'], {})
-        
-        existing_tid = entry.get("tar_id", None)
-        existing_key = entry.get("archive_key", None)
-        
-        is_changed = entry.get("last_metadata_hash") != current_hash
-        
-        if is_repack:
-            needs_upload = True
-        else:
-            needs_upload = is_changed or entry.get("needs_upload", True)
-
-        archive_key = existing_key if not is_changed else None
-
-        branch_leaves[leaf['key']] = {
-            "last_metadata_hash": current_hash,
-            "needs_upload": needs_upload,
-            "size_bytes": size,
-            "size_human": format_bytes(size),
-            "tar_id": existing_tid, 
-            "archive_key": archive_key,
-            "last_upload": entry.get("last_upload", None)
-        }
-        
-        leaf_data = leaf.copy()
-        leaf_data.update({"size": size, "tar_id": existing_tid})
-        leaves_to_bag.append(leaf_data)
-        
-    return leaves_to_bag
 
+def update_leaf_entry(leaf, current_hash, size, branch_leaves, is_repack):
+    """Refresh one leaf's inventory entry from its metadata hash; the leaf itself gains size/tar_id for bagging."""
+    entry = branch_leaves.get(leaf['key'], {})
+
+    existing_tid = entry.get("tar_id", None)
+    existing_key = entry.get("archive_key", None)
+
+    is_changed = entry.get("last_metadata_hash") != current_hash
+
+    if is_repack:
+        needs_upload = True
+    else:
+        needs_upload = is_changed or entry.get("needs_upload", True)
+
+    archive_key = existing_key if not is_changed else None
+
+    branch_leaves[leaf['key']] = {
+        "last_metadata_hash": current_hash,
+        "needs_upload": needs_upload,
+        "size_bytes": size,
+        "size_human": format_bytes(size),
+        "tar_id": existing_tid,
+        "archive_key": archive_key,
+        "last_upload": entry.get("last_upload", None)
+    }
+    # An unchanged leaf still sits in the same bag, so --audit can keep verifying it
+    if not is_changed:
+        for field in ("etag", "checksum_sha256"):
+            if entry.get(field):
+                branch_leaves[leaf['key']][field] = entry[field]
+
+    leaf["size"] = size
+    leaf["tar_id"] = existing_tid
+    return leaf
+
+
+def bag_totals(leaves):
+    """Bytes per tar_id across a leaves dict, in one pass."""
+    totals = {}
+    for unit in leaves.values():
+        tid = unit.get('tar_id')
+        if tid:
+            totals[tid] = totals.get(tid, 0) + unit.get('size_bytes', 0)
+    return totals
+
+def max_bag_number(tar_ids):
+    """Highest N among 'bag_N' ids, or 0. Pass distinct ids: each one is string-parsed."""
+    best = 0
+    for tid in tar_ids:
+        if tid and tid.startswith('bag_'):
+            try:
+                best = max(best, int(tid.split('_')[-1]))
+            except ValueError: pass
+    return best
+
+# Highest bag number in the run's inventory, found once and raised as bags are assigned. The
+# inventory dict itself is held and compared with 'is' (never id(), which CPython reuses), so
+# the maximum can only ever be read back for the inventory it was counted from.
+GLOBAL_BAG_MAX = {"inventory": None, "max": 0}
 
 def assign_bags_to_leaves(leaves_to_bag, inventory, branch_leaves, is_repack):
     """Assign bags to leaves based on repack status and size."""
@@ -1287,60 +1796,63 @@ def assign_bags_to_leaves(leaves_to_bag, inventory, branch_leaves, is_repack):
             leaf["tar_id"] = None
         bag_counter = 1
     else:
-        # Find the highest bag number in the ENTIRE inventory
-        existing_bag_nums = []
-        for branch_data in inventory["branches"].values():
-            for unit in branch_data.get("leaves", {}).values():
-                tid = unit.get('tar_id')
-                if tid and tid.startswith('bag_'):
-                    try:
-                        existing_bag_nums.append(int(tid.split('_')[-1]))
-                    except ValueError: pass
-        
-        bag_counter = max(existing_bag_nums) if existing_bag_nums else 0
+        if GLOBAL_BAG_MAX["inventory"] is not inventory:
+            # Find the highest bag number in the ENTIRE inventory (only the first branch pays for this)
+            # Many leaves share a bag, so parse each distinct id once
+            GLOBAL_BAG_MAX["max"] = max_bag_number({
+                unit.get('tar_id')
+                for branch_data in inventory["branches"].values()
+                for unit in branch_data.get("leaves", {}).values()
+            })
+            GLOBAL_BAG_MAX["inventory"] = inventory
+        bag_counter = GLOBAL_BAG_MAX["max"]
         
         # If this specific branch already has bags, find this branch's highest bag
-        branch_bag_nums = []
-        for unit in branch_leaves.values():
-            tid = unit.get('tar_id')
-            if tid and tid.startswith('bag_'):
-                try:
-                    branch_bag_nums.append(int(tid.split('_')[-1]))
-                except ValueError: pass
+        branch_totals = bag_totals(branch_leaves)
+        branch_max = max_bag_number(branch_totals)
         
-        if not branch_bag_nums:
+        if not branch_max:
             # This branch has never been backed up, so it gets the NEXT global number
             bag_counter += 1
         else:
             # This branch exists; we continue from its own highest bag
-            bag_counter = max(branch_bag_nums)
+            bag_counter = branch_max
 
     current_bag_size = 0
     
     # In standard mode, calculate how much is already in the last bag
     if not is_repack:
-        last_bag_id = f"bag_{bag_counter:05d}"
-        for unit in branch_leaves.values():
-            if unit.get('tar_id') == last_bag_id:
-                current_bag_size += unit.get('size_bytes', 0)
-
-    for leaf in leaves_to_bag:
-        # If not repacking, respect the "Reserved Seat"
-        if not is_repack and leaf["tar_id"]:
-            continue 
-        
-        # Logic for assigning to a bag (new leaves or ALL leaves if repacking)
-        if (current_bag_size + leaf["size"] > TARGET_SIZE_BYTES) and current_bag_size > 0:
+        current_bag_size = branch_totals.get(f"bag_{bag_counter:05d}", 0)
+
+    # If not repacking, respect the "Reserved Seat"
+    seatless = [leaf for leaf in leaves_to_bag if is_repack or not leaf["tar_id"]]
+    assigned = bool(seatless)
+
+    # First-Fit-Decreasing: place the largest leaves first, each into the first open bag with room.
+    # Open bags are the branch's last bag plus any opened here; earlier bags stay sealed.
+    open_bags = [[bag_counter, current_bag_size]]
+    for leaf in sorted(seatless, key=lambda l: l["size"], reverse=True):
+        for bag in open_bags:
+            # An empty bag takes any leaf, so oversized leaves still get a bag of their own
+            if bag[1] == 0 or bag[1] + leaf["size"] <= TARGET_SIZE_BYTES:
+                break
+        else:
             bag_counter += 1
-            current_bag_size = 0
+            bag = [bag_counter, 0]
+            open_bags.append(bag)
         
-        new_tid = f"bag_{bag_counter:05d}"
+        new_tid = f"bag_{bag[0]:05d}"
         leaf["tar_id"] = new_tid
-        current_bag_size += leaf["size"]
+        bag[1] += leaf["size"]
         
         # Update the inventory brain
         branch_leaves[leaf["key"]]["tar_id"] = new_tid
-        
+
+    if is_repack:
+        # Renumbering can lower the inventory-wide maximum; rescan for the next branch
+        GLOBAL_BAG_MAX["inventory"] = None
+    elif assigned:
+        GLOBAL_BAG_MAX["max"] = max(GLOBAL_BAG_MAX["max"], bag_counter)
     return bag_counter
 
 
@@ -1395,11 +1907,11 @@ def process_branch_bags(bags, scan_path, short_name, is_live, branch_leaves, hos
                        remote_conn, remote_base_path, inventory, branch_excludes, 
                        encryption_config):
     """Process each bag in the branch."""
-    sorted_bag_ids = sorted(bags.keys(), key=lambda x: bags[x]["bag_num_int"])
+    # Leaves arrive in scan order and FFD seats them in any bag, so insertion order is not bag order
+    sorted_bags = [bag_data for _, bag_data in sorted(bags.items(), key=lambda kv: kv[1]["bag_num_int"])]
     safe_prefix = short_name.replace(" ", "_")
 
-    for tid in sorted_bag_ids:
-        bag_data = bags[tid]
+    def run_bag(bag_data):
         process_bag(
             bag_data["bag_num_int"], 
             bag_data["leaves"], 
@@ -1420,6 +1932,16 @@ def process_branch_bags(bags, scan_path, short_name, is_live, branch_leaves, hos
             encryption_config
         )
 
+    # Bags share the run's upload throttle, so upload_limit_mb still caps their combined bandwidth
+    if PARALLEL_BAGS > 1 and len(sorted_bags) > 1:
+        with ThreadPoolExecutor(max_workers=PARALLEL_BAGS) as ex:
+            futures = [ex.submit(run_bag, bag_data) for bag_data in sorted_bags]
+            for fut in as_completed(futures):
+                fut.result()
+    else:
+        for bag_data in sorted_bags:
+            run_bag(bag_data)
+
 
 def handle_repack_cleanup(hostname, safe_prefix, bag_counter, s3_client, S3_BUCKET, S3_PREFIX):
     """Clean up orphaned tail bags after a repack operation."""
@@ -1431,33 +1953,27 @@ def handle_repack_cleanup(hostname, safe_prefix, bag_counter, s3_client, S3_BUCK
     
     # List what is actually on S3
     found_orphans = []
+    list_kwargs = {"Bucket": S3_BUCKET, "Prefix": s3_search_prefix}
+    if bag_counter < 10000:
+        # Names are zero-padded to 5 digits, so every key listed after our last bag is a tail candidate;
+        # S3 skips the live bags server-side. (At 10000+ a 6-digit name could sort before the marker.)
+        list_kwargs["StartAfter"] = f"{s3_search_prefix}{bag_counter:05d}.tar"
+    # Strict pattern so nothing but this branch's bags can be deleted: ..._bag_00008.tar -> 8
+    bag_key_re = re.compile(re.escape(s3_search_prefix) + r"(\d+)\.tar")
     paginator = s3_client.get_paginator('list_objects_v2')
-    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=s3_search_prefix):
+    for page in paginator.paginate(**list_kwargs):
         for obj in page.get('Contents', []):
             key = obj['Key']
-            # Verify it matches our strict pattern to avoid deleting wrong files
-            if key.endswith(".tar") and branch_bag_prefix in key:
-                try:
-                    # Extract number: ..._bag_00008.tar -> 8
-                    fname = os.path.basename(key)
-                    num_part = fname.replace(branch_bag_prefix, "").replace(".tar", "")
-                    bag_num = int(num_part)
-                    
-                    # If this number is higher than our current counter, it's a tail orphan
-                    if bag_num > bag_counter:
-                        found_orphans.append(key)
-                except ValueError:
-                    continue
+            m = bag_key_re.fullmatch(key)
+            # If this number is higher than our current counter, it's a tail orphan
+            if m and int(m.group(1)) > bag_counter:
+                found_orphans.append(key)
 
     if found_orphans:
         print(f"  [CLEANUP] Found {len(found_orphans)} obsolete leaf bags. Deleting...")
         for orphan in found_orphans:
-            try:
-                print(f"  [S3 DELETE] {orphan}")
-                response = s3_client.delete_object(Bucket=S3_BUCKET, Key=orphan)
-                log_aws_transaction("DELETE_REPACK", orphan, 0, "N/A", response.get('ResponseMetadata', {}), "DEL-RPK")
-            except Exception as e:
-                print(f"  [WARN] Failed to delete {orphan}: {e}")
+            print(f"  [S3 DELETE] {orphan}")
+        delete_s3_keys(found_orphans, "DELETE_REPACK", "DEL-RPK", bucket=S3_BUCKET)
     else:
         print(f"  [CLEANUP] No orphans found.")
 
@@ -1479,23 +1995,15 @@ def generate_full_report(inventory, config):
     except:
         target = 40 * 1024**3
 
+    # Per-branch totals saved with the inventory; any branch whose summary looks stale is walked instead
     for branch_name in sorted(branches.keys()):
         data = branches[branch_name]
-        leaves_dict = data.get('leaves', {})
-        
-        branch_total_bytes = 0
-        unique_bags = set()
-        
-        # Mapping to YOUR keys: size_bytes and tar_id
-        for meta in leaves_dict.values():
-            branch_total_bytes += meta.get('size_bytes', 0)
-            bid = meta.get('tar_id')
-            if bid:
-                unique_bags.add(bid)
+        summary = branch_summary(data)
+        branch_total_bytes = summary['bytes']
+        bag_count = summary['bags']
         
         # Formatting for the report
         size_str = format_bytes(branch_total_bytes)
-        bag_count = len(unique_bags)
         
         # Waste: Only useful for single-bag branches (like your VMs)
         waste_str = "---"
@@ -1534,9 +2042,9 @@ def generate_full_report(inventory, config):
             total_bytes += details.get('size_bytes', 0)
             if details.get('archive_key'):
                 total_bags.add(details['archive_key'])
+    bag_count = len(total_bags)
 
     total_gb = total_bytes / (1024**3)
-    bag_count = len(total_bags)
 
     # --- CALCULATIONS ---
     monthly_cost = total_gb * p_gb
@@ -1576,6 +2084,115 @@ def find_file(search_term):
         print(f"[ERROR] Manifest directory not found: {MANIFEST_DIR}")
         return
 
+    owner_index = build_leaf_owner_index(inventory)
+    for bag_name, line in find_manifest_matches(search_term.lower()):
+        found_count += 1
+        
+        # Perform the reverse lookup in the inventory
+        leaf, branch = find_leaf_owner(line, inventory, owner_index)
+        
+        print("-" * 60)
+        print(f"  [FOUND] in bag      : {bag_name}")
+        print(f"  Leaf (Atomic Unit)  : {leaf}")
+        print(f"  Branch (tree file)  : {branch}")
+        print(f"  File Path           : {line}")
+    
+    if found_count == 0:
+        print("  No matches found in local manifests.")
+    else:
+        print("-" * 60)
+        print(f"--- Found {found_count} matches ---")
+
+def find_manifest_matches(term_lower):
+    """
+    Yields (bag_name, line) for every manifest line containing term_lower, in manifest-name
+    and line order. Searches the SQLite index; falls back to reading the files if it is unusable.
+    """
+    try:
+        with closing(sqlite3.connect(MANIFEST_INDEX_FILE)) as conn:
+            sync_manifest_index(conn)
+            rows = conn.execute(
+                "SELECT manifest, path FROM lines WHERE instr(path_lower, ?) > 0 ORDER BY manifest, line_no",
+                (term_lower,)).fetchall()
+    except sqlite3.Error as e:
+        print(f"  [WARN] Manifest index unavailable ({e}); scanning manifests directly.")
+        yield from scan_manifest_matches(term_lower)
+        return
+
+    for manifest, line in rows:
+        yield manifest.replace(".txt", ""), line
+
+def manifest_lines_under(manifest_path, prefix):
+    """
+    Lines of one manifest that start with prefix, in file order. If the index already holds this
+    manifest unchanged (mtime/size), the prefix test runs inside SQLite; otherwise the file is
+    streamed. The index is opened read-only and never created here (see index_manifest).
+    """
+    name = os.path.basename(manifest_path)
+    try:
+        st = os.stat(manifest_path)
+        index_uri = pathlib.Path(MANIFEST_INDEX_FILE).absolute().as_uri() + "?mode=ro"
+        with closing(sqlite3.connect(index_uri, uri=True)) as conn:
+            stamp = conn.execute("SELECT mtime_ns, size FROM manifests WHERE name = ?", (name,)).fetchone()
+            if stamp == (st.st_mtime_ns, st.st_size):
+                return [path for (path,) in conn.execute(
+                    "SELECT path FROM lines WHERE manifest = ? AND substr(path, 1, ?) = ? ORDER BY line_no",
+                    (name, len(prefix), prefix))]
+    except (OSError, sqlite3.Error):
+        pass  # No index yet (or not for this manifest): stream the file below
+
+    with open(manifest_path, 'r', encoding='utf-8', errors='ignore') as f:
+        return [line for line in (l.strip() for l in f) if line.startswith(prefix)]
+
+def index_manifest(txt_name):
+    """Adds a manifest the backup run just wrote to the SQLite index. Best effort: lookups fall back to the file."""
+    try:
+        with closing(sqlite3.connect(MANIFEST_INDEX_FILE)) as conn:
+            sync_manifest_index(conn, only={txt_name})
+    except sqlite3.Error as e:
+        print(f"  [WARN] Could not index manifest {txt_name}: {e}")
+
+def sync_manifest_index(conn, only=None):
+    """
+    Brings the index up to date: manifests that are new or changed (mtime/size) are re-read, deleted ones dropped.
+    If only is a set of manifest names, just those are checked (a single-manifest lookup skips the rest).
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS manifests (name TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER)")
+    # path_lower is lowered by Python so matching is exactly the old case-insensitive 'in' test
+    conn.execute("CREATE TABLE IF NOT EXISTS lines (manifest TEXT, line_no INTEGER, path TEXT, path_lower TEXT)")
+    conn.execute("CREATE INDEX IF NOT EXISTS lines_by_manifest ON lines (manifest)")
+
+    known = {name: (mtime_ns, size) for name, mtime_ns, size in conn.execute("SELECT name, mtime_ns, size FROM manifests")}
+    on_disk = {}
+    with os.scandir(MANIFEST_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".txt") and (only is None or entry.name in only):
+                st = entry.stat()
+                on_disk[entry.name] = (st.st_mtime_ns, st.st_size)
+    if only is not None:
+        known = {name: stamp for name, stamp in known.items() if name in only}
+
+    with conn:
+        for name in known.keys() - on_disk.keys():
+            conn.execute("DELETE FROM lines WHERE manifest = ?", (name,))
+            conn.execute("DELETE FROM manifests WHERE name = ?", (name,))
+
+        for name, stamp in sorted(on_disk.items()):
+            if known.get(name) == stamp:
+                continue
+            conn.execute("DELETE FROM lines WHERE manifest = ?", (name,))
+            conn.execute("DELETE FROM manifests WHERE name = ?", (name,))
+            try:
+                with open(os.path.join(MANIFEST_DIR, name), 'r', encoding='utf-8', errors='ignore') as f:
+                    rows = [(name, line_no, line, line.lower()) for line_no, line in enumerate(l.strip() for l in f)]
+            except OSError as e:
+                print(f"  [WARN] Could not read manifest {name}: {e}")
+                continue
+            conn.executemany("INSERT INTO lines VALUES (?, ?, ?, ?)", rows)
+            conn.execute("INSERT INTO manifests VALUES (?, ?, ?)", (name, *stamp))
+
+def scan_manifest_matches(term_lower):
+    """Index-free search: reads every manifest line by line."""
     for manifest in sorted(os.listdir(MANIFEST_DIR)):
         # Only process manifest text files
         if not manifest.endswith(".txt"): 
@@ -1586,64 +2203,114 @@ def find_file(search_term):
         
         try:
             with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                for line in f:
-                    line = line.strip()
-                    # Case-insensitive search
-                    if search_term.lower() in line.lower():
-                        found_count += 1
-                        
-                        # Perform the reverse lookup in the inventory
-                        leaf, branch = find_leaf_owner(line, inventory)
-                        
-                        print("-" * 60)
-                        print(f"  [FOUND] in bag      : {bag_name}")
-                        print(f"  Leaf (Atomic Unit)  : {leaf}")
-                        print(f"  Branch (tree file)  : {branch}")
-                        print(f"  File Path           : {line}")
+                matches = [line for line in (l.strip() for l in f) if term_lower in line.lower()]
         except Exception as e:
              print(f"  [WARN] Could not read manifest {manifest}: {e}")
+             continue
+        for line in matches:
+            yield bag_name, line
+
+def find_in_manifest(path, term_lower):
+    """
+    Returns the first line of a manifest containing term_lower (case-insensitive), or None.
+    The manifest is read and lowered once, then searched with a single str.find pass.
+    """
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        text = f.read()
+
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # Unicode case folding shifted the offsets; fall back to a line scan
+        return next((line.strip() for line in text.splitlines() if term_lower in line.lower()), None)
+
+    idx = lowered.find(term_lower)
+    if idx == -1:
+        return None
+
+    start = text.rfind('\n', 0, idx) + 1
+    end = text.find('\n', idx)
+    if end == -1:
+        end = len(text)
+    return text[start:end].strip()
+
+def list_s3_objects(prefix, boundaries):
+    """
+    Lists every object under prefix, fanning out over key ranges split at boundaries.
     
-    if found_count == 0:
-        print("  No matches found in local manifests.")
-    else:
-        print("-" * 60)
-        print(f"--- Found {found_count} matches ---")
+    The ranges are (None, b1], (b1, b2], ... (bn, None) so the listing stays complete:
+    keys outside any known branch (orphans, system files) still land in some range.
+    
+    Returns:
+        dict: key -> {'size', 'etag' (quotes removed), 'class'}
+    """
+    edges = [None] + sorted(b for b in boundaries if b.startswith(prefix)) + [None]
+    
+    def list_range(start_after, stop_at):
+        kwargs = {'Bucket': S3_BUCKET, 'Prefix': prefix}
+        if start_after:
+            kwargs['StartAfter'] = start_after
+        found = {}
+        for page in s3_client.get_paginator('list_objects_v2').paginate(**kwargs):
+            for obj in page.get('Contents', []):
+                if stop_at is not None and obj['Key'] > stop_at:
+                    return found
+                found[obj['Key']] = {
+                    'size': obj['Size'],
+                    'etag': obj['ETag'].replace('"', ''),
+                    'class': obj.get('StorageClass', 'STANDARD') # Default is Standard if missing
+                }
+        return found
+    
+    actual = {}
+    with ThreadPoolExecutor(max_workers=AUDIT_LIST_WORKERS, thread_name_prefix="s3list") as ex:
+        for part in ex.map(list_range, edges[:-1], edges[1:]):
+            actual.update(part)
+    return actual
+
+def fetch_s3_checksums(keys):
+    """
+    HEADs each key with ChecksumMode enabled, AUDIT_LIST_WORKERS at a time.
+    
+    Returns:
+        dict: key -> ChecksumSHA256 (None if S3 holds none or the HEAD failed)
+    """
+    def head_one(key):
+        try:
+            response = s3_client.head_object(Bucket=S3_BUCKET, Key=key, ChecksumMode='ENABLED')
+            return key, response.get('ChecksumSHA256')
+        except Exception as e:
+            print(f"  [WARN] Could not read checksum for {key}: {e}")
+            return key, None
+    
+    with ThreadPoolExecutor(max_workers=AUDIT_LIST_WORKERS, thread_name_prefix="s3head") as ex:
+        return dict(ex.map(head_one, keys))
 
 def audit_s3(inventory):
     """Compares local inventory against actual S3 bucket contents and verifies Storage Class."""
     print(f"\n--- S3 Integrity & Cost Audit ---")
     
-    # 1. Map expected bags from inventory
-    expected_bags = {} 
+    # 1. Map expected bags from inventory (one pass; bags shared by many leaves accumulate)
+    expected_bags = defaultdict(lambda: {'size': 0, 'etag': None, 'checksum': None})
     for branch, data in inventory.get("branches", {}).items():
         for leaf, details in data.get("leaves", {}).items():
             key = details.get('archive_key')
             if not key: continue
-            inv_etag = details.get('etag')
-            size = details.get('size_bytes', 0)
-            if key not in expected_bags:
-                expected_bags[key] = {'size': 0, 'etag': inv_etag}
-            expected_bags[key]['size'] += size
+            bag = expected_bags[key]
+            bag['size'] += details.get('size_bytes', 0)
+            bag['etag'] = bag['etag'] or details.get('etag')
+            bag['checksum'] = bag['checksum'] or details.get('checksum_sha256')
 
     # 2. Get actual list from S3 (Now fetching StorageClass too)
     print(f"  [FETCHING] Remote file list from s3://{S3_BUCKET}/{S3_PREFIX}...")
-    actual_s3_data = {}
-    paginator = s3_client.get_paginator('list_objects_v2')
-    
     wrong_tier_count = 0
     
-    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=S3_PREFIX):
-        for obj in page.get('Contents', []):
-            key = obj['Key']
-            # Normalize ETag (remove quotes)
-            etag = obj['ETag'].replace('"', '')
-            storage_class = obj.get('StorageClass', 'STANDARD') # Default is Standard if missing
-            
-            actual_s3_data[key] = {
-                'size': obj['Size'], 
-                'etag': etag,
-                'class': storage_class
-            }
+    # Each branch's bags share a "<host>_<branch>_bag_" prefix, so those make natural shard boundaries
+    boundaries = {k.rsplit("_bag_", 1)[0] + "_bag_" for k in expected_bags if "_bag_" in k}
+    actual_s3_data = list_s3_objects(S3_PREFIX, boundaries)
+
+    # LIST does not return checksum values, so bags uploaded with one are HEADed for it
+    checksummed = [k for k, info in expected_bags.items() if info['checksum'] and k in actual_s3_data]
+    actual_checksums = fetch_s3_checksums(checksummed) if checksummed else {}
 
     # 3. Perform the Audit
     missing = []
@@ -1661,8 +2328,12 @@ def audit_s3(inventory):
             
         s3_obj = actual_s3_data[bag_key]
         
-        # B) Check Integrity
-        if info['etag']:
+        # B) Check Integrity (SHA-256 where the bag has one; older bags only have the ETag)
+        if info['checksum']:
+            verified_with_etag += 1
+            if info['checksum'] != actual_checksums.get(bag_key):
+                corruption.append(bag_key)
+        elif info['etag']:
             verified_with_etag += 1
             if info['etag'] != s3_obj['etag']:
                 corruption.append(bag_key)
@@ -1700,19 +2371,16 @@ def check_encryption_needed(line_metadata):
     """Returns True if the ENCRYPT tag is present in the branch line."""
     return "ENCRYPT" in line_metadata
 
-def validate_encryption_config(tree_file):
+def validate_encryption_config(tree_lines):
     """
     Checks if the mission requires GPG encryption and ensures the key file exists.
+    tree_lines is the cleaned list from read_tree_lines(), so tree.txt is not re-read.
     Returns the path to the PASSPHRASE_FILE if valid, otherwise exits.
     """
-    passphrase_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "key.txt")
-    needs_crypto = False
+    passphrase_file = os.path.join(BASE_DIR, "key.txt")
 
     # 1. Check tree.txt for the ::ENCRYPT trigger
-    if os.path.exists(tree_file):
-        with open(tree_file, 'r') as f:
-            if "::ENCRYPT" in f.read():
-                needs_crypto = True
+    needs_crypto = any("::ENCRYPT" in line for line in tree_lines)
 
     # 2. Validation Logic Gate
     if needs_crypto:
@@ -1791,7 +2459,7 @@ def prepare_staging_environment(leaf_path, leaf_id, files=None, remote_conn=None
     }
 
 
-def run_with_heartbeat(cmd, output_path, expected_size, status, shell=True, is_dir=False):
+def run_with_heartbeat(cmd, output_path, expected_size, status, shell=True, is_dir=False, input=None):
     """
     Run a command with heartbeat progress monitoring.
     
@@ -1802,6 +2470,7 @@ def run_with_heartbeat(cmd, output_path, expected_size, status, shell=True, is_d
         status: Status label for heartbeat
         shell: Whether to run command in shell
         is_dir: Whether output_path is a directory
+        input: Bytes fed to the command's stdin (e.g. a tar file list)
     
     Returns:
         bool: True if successful, False otherwise
@@ -1819,6 +2488,7 @@ def run_with_heartbeat(cmd, output_path, expected_size, status, shell=True, is_d
             cmd, 
             shell=shell, 
             check=True,
+            input=input,
             stdout=subprocess.DEVNULL,
             stderr=subprocess.PIPE
         )
@@ -1851,28 +2521,29 @@ def encrypt_leaf(leaf_path, files=None, passphrase_file=None, compress=False, re
     if staging is None:
         return None
     
-    # 3. Prepare file paths
-    tar_flags, ext = prepare_archive_params(compress)
-    intermediate_file, encrypted_path = prepare_encryption_paths(leaf_id, ext)
+    # 3. Prepare file paths (tar streams straight into gpg, so only the encrypted file is staged)
+    tar_flags = prepare_archive_params(compress)
+    encrypted_path = prepare_encryption_paths(leaf_id)
     
     # 4. Build tar command
     tar_cmd = build_tar_command_for_encryption(
         staging["target_path"], staging["parent"], 
-        staging["base"], files, tar_flags, intermediate_file
+        staging["base"], files, tar_flags
     )
     
     # 5. Build encryption command
     gpg_cmd = build_encryption_command(
-        intermediate_file, encrypted_path, passphrase_file, encryption_config
+        encrypted_path, passphrase_file, encryption_config
     )
     
     # 6. Execute encryption process
     success = execute_encryption_process(
-        tar_cmd, gpg_cmd, intermediate_file, encrypted_path, expected_size, hb=hb, compress=compress
+        tar_cmd, gpg_cmd, encrypted_path, expected_size, hb=hb, compress=compress,
+        tar_input=build_tar_file_list(files)
     )
     
     # 7. Cleanup and return
-    cleanup_encryption_temp(intermediate_file, staging["local_raw"])
+    cleanup_encryption_temp(staging["local_raw"])
     
     return encrypted_path if success else None
 
@@ -1895,37 +2566,42 @@ def validate_encryption_parameters(passphrase_file, encryption_config):
 
 
 def prepare_archive_params(compress):
-    """Prepare archive parameters based on compression need."""
-    tar_flags = "-czf" if compress else "-cf"
-    ext = ".tar.gz" if compress else ".tar"
-    return tar_flags, ext
+    """Prepare tar flags based on compression need (the archive is written to stdout)."""
+    return [COMPRESS_TAR_FLAG, "-cf"] if compress else ["-cf"]
 
 
-def prepare_encryption_paths(leaf_id, ext):
-    """Prepare paths for intermediate and final encrypted files."""
-    intermediate_file = os.path.join(STAGING_DIR, f"bundle_{leaf_id}{ext}")
-    encrypted_path = os.path.join(STAGING_DIR, f"enc_{leaf_id}.gpg")
-    return intermediate_file, encrypted_path
+def prepare_encryption_paths(leaf_id):
+    """Prepare the path of the encrypted file."""
+    return os.path.join(STAGING_DIR, f"enc_{leaf_id}.gpg")
 
 
-def build_tar_command_for_encryption(target_path, parent, base, files, tar_flags, intermediate_file):
-    """Build the tar command for the first phase of encryption."""
+def build_tar_file_list(files):
+    """
+    NUL-separated names for tar's "--null -T -": no ARG_MAX limit on huge branch roots,
+    and any byte in a name (quotes, newlines, a leading dash) is taken literally.
+    """
+    if not files:
+        return None
+    return b"".join(os.fsencode(f) + b"\0" for f in files)
+
+
+def build_tar_command_for_encryption(target_path, parent, base, files, tar_flags):
+    """Build the tar argv that feeds gpg through a pipe (file names come from build_tar_file_list on stdin)."""
     if files:
-        files_list = " ".join([shlex.quote(f) for f in files])
-        return f"tar -C {shlex.quote(target_path)} {tar_flags} {shlex.quote(intermediate_file)} {files_list}"
+        return ["tar", "-C", target_path, *tar_flags, "-", "--null", "-T", "-"]
     else:
-        return f"tar -C {shlex.quote(parent)} {tar_flags} {shlex.quote(intermediate_file)} {shlex.quote(base)}"
+        return ["tar", "-C", parent, *tar_flags, "-", base]
 
 
-def build_encryption_command(intermediate_file, encrypted_path, passphrase_file, encryption_config):
-    """Build GPG command based on encryption method."""
+def build_encryption_command(encrypted_path, passphrase_file, encryption_config):
+    """Build GPG command based on encryption method. gpg reads the archive from stdin."""
     if encryption_config and encryption_config['method'] == 'key':
         # Use key-based encryption
         return [
             "gpg", "--batch", "--yes",
             "--recipient", encryption_config['gpg_key_id'],
             "--output", encrypted_path,
-            "--encrypt", intermediate_file
+            "--encrypt"
         ]
     else:
         # Use password-based encryption
@@ -1933,11 +2609,40 @@ def build_encryption_command(intermediate_file, encrypted_path, passphrase_file,
             "gpg", "--batch", "--yes", 
             "--passphrase-file", passphrase_file,
             "--symmetric", "--cipher-algo", "AES256", 
-            "--output", encrypted_path, 
-            intermediate_file
+            "--output", encrypted_path
         ]
 
-def execute_encryption_process(tar_cmd, gpg_cmd, intermediate_file, encrypted_path, expected_size, hb=None, compress=False):
+def run_tar_into_gpg(tar_cmd, gpg_cmd, tar_input=None):
+    """
+    Runs tar | gpg as one pipeline without a shell, so the plain archive never touches disk.
+    tar_input, if given, is written to tar's stdin (its file list).
+    Raises CalledProcessError if either side fails.
+    """
+    tar_proc = subprocess.Popen(tar_cmd, stdin=subprocess.PIPE if tar_input is not None else None,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        gpg_proc = subprocess.Popen(gpg_cmd, stdin=tar_proc.stdout, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    finally:
+        # gpg holds its own copy; closing ours lets tar see EPIPE if gpg dies
+        tar_proc.stdout.close()
+    if tar_input is not None:
+        try:
+            tar_proc.stdin.write(tar_input)
+        except BrokenPipeError:
+            pass  # tar exited early; its return code below reports why
+        finally:
+            try:
+                tar_proc.stdin.close()
+            except BrokenPipeError:
+                pass
+    gpg_rc = gpg_proc.wait()
+    tar_rc = tar_proc.wait()
+    if tar_rc != 0:
+        raise subprocess.CalledProcessError(tar_rc, tar_cmd)
+    if gpg_rc != 0:
+        raise subprocess.CalledProcessError(gpg_rc, gpg_cmd)
+
+def execute_encryption_process(tar_cmd, gpg_cmd, encrypted_path, expected_size, hb=None, compress=False, tar_input=None):
     # Create a heartbeat if not provided
     local_hb = False
     if not hb:
@@ -1946,32 +2651,11 @@ def execute_encryption_process(tar_cmd, gpg_cmd, intermediate_file, encrypted_pa
         local_hb = True
         
     try:
-        # PHASE 1: TAR
-        # For TAR: update with correct target size and status
-        if not os.path.exists(intermediate_file):
-            # Create an empty file to track
-            with open(intermediate_file, 'wb') as f:
-                pass
-                
-        # Set an appropriate target size for TAR based on expected_size
+        # TAR and GPG run together; progress follows the encrypted output
         tar_target_size = expected_size * 1.1  # Add 10% for tar overhead
-        hb.update_target(intermediate_file, "TAR: LEAF", target_size=tar_target_size, is_compressed=compress)
-        
-        # Run tar command
-        subprocess.run(tar_cmd, shell=True, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        hb.update_target(encrypted_path, "GPG: LEAF", target_size=tar_target_size, is_compressed=compress)
         
-        # Get actual size after TAR completion
-        actual_tar_size = os.path.getsize(intermediate_file)
-        
-        # Mark TAR as complete
-        hb.snap_done()
-        
-        # PHASE 2: GPG
-        # For GPG: target size is the actual size of the intermediate file
-        hb.update_target(encrypted_path, "GPG: LEAF", target_size=actual_tar_size)
-        
-        # Run gpg command
-        subprocess.run(gpg_cmd, shell=False, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        run_tar_into_gpg(tar_cmd, gpg_cmd, tar_input)
         
         # Mark GPG as complete
         hb.snap_done()
@@ -1983,25 +2667,17 @@ def execute_encryption_process(tar_cmd, gpg_cmd, intermediate_file, encrypted_pa
         if local_hb and hb:
             hb.stop()
 
-def BASICexecute_encryption_process(tar_cmd, gpg_cmd, intermediate_file, encrypted_path, expected_size, hb=None):
+def BASICexecute_encryption_process(tar_cmd, gpg_cmd, encrypted_path, expected_size, hb=None, tar_input=None):
     # We ignore the 'hb' (Heartbeat) entirely to stop the threading issues
     
-    # PHASE 1: TAR
-    print(f"  [TAR: LEAF] : Packaging... ", end="", flush=True)
-    subprocess.run(tar_cmd, shell=True, check=True)
-    print(f"100.0% [DONE]")
-
-    # PHASE 2: GPG
-    print(f"  [GPG: LEAF] : Encrypting... ", end="", flush=True)
-    subprocess.run(gpg_cmd, shell=False, check=True)
+    print(f"  [GPG: LEAF] : Packaging and encrypting... ", end="", flush=True)
+    run_tar_into_gpg(tar_cmd, gpg_cmd, tar_input)
     print(f"100.0% [DONE]")
     
     return os.path.exists(encrypted_path)
 
-def cleanup_encryption_temp(intermediate_file, local_raw):
+def cleanup_encryption_temp(local_raw):
     """Clean up temporary files used during encryption."""
-    if os.path.exists(intermediate_file):
-        os.remove(intermediate_file)
     if local_raw and os.path.exists(local_raw):
         shutil.rmtree(local_raw)
 
@@ -2022,7 +2698,7 @@ def compress_leaf(leaf_path, files=None, remote_conn=None, remote_base_path=None
         return None
     
     # 2. Prepare file paths
-    compressed_path = os.path.join(STAGING_DIR, f"comp_{leaf_id}.tar.gz")
+    compressed_path = os.path.join(STAGING_DIR, f"comp_{leaf_id}.tar{COMPRESS_EXT}")
     
     # 3. Build compression command
     cmd = build_compression_command(
@@ -2030,14 +2706,15 @@ def compress_leaf(leaf_path, files=None, remote_conn=None, remote_base_path=None
         staging["base"], files, compressed_path
     )
     
-    # 4. Execute compression with heartbeat
+    # 4. Execute compression with heartbeat (argv, no shell; loose file names go in on stdin)
+    file_list = build_tar_file_list(files)
     if hb:
         hb.update_target(compressed_path, new_status="TAR: LEAF", is_compressed=True)
-        subprocess.run(cmd, shell=True, check=True, stdout=subprocess.DEVNULL)
+        subprocess.run(cmd, input=file_list, check=True, stdout=subprocess.DEVNULL)
         success = True
     else:
         success = run_with_heartbeat(
-            cmd, compressed_path, expected_size, "TAR: LEAF"
+            cmd, compressed_path, expected_size, "TAR: LEAF", shell=False, input=file_list
         )
     
     # 5. Cleanup and return
@@ -2048,12 +2725,11 @@ def compress_leaf(leaf_path, files=None, remote_conn=None, remote_base_path=None
 
 
 def build_compression_command(target_path, parent, base, files, compressed_path):
-    """Build the tar command for compression."""
+    """Build the tar argv for compression (file names come from build_tar_file_list on stdin)."""
     if files:
-        files_list = " ".join([shlex.quote(f) for f in files])
-        return f"tar -C {shlex.quote(target_path)} -czf {shlex.quote(compressed_path)} {files_list}"
+        return ["tar", "-C", target_path, COMPRESS_TAR_FLAG, "-cf", compressed_path, "--null", "-T", "-"]
     else:
-        return f"tar -C {shlex.quote(parent)} -czf {shlex.quote(compressed_path)} {shlex.quote(base)}"
+        return ["tar", "-C", parent, COMPRESS_TAR_FLAG, "-cf", compressed_path, base]
 
 
 def load_inventory(inventory_path):
@@ -2063,9 +2739,21 @@ def load_inventory(inventory_path):
     If malformed, exits to prevent state corruption.
     """
     if os.path.exists(inventory_path):
+        st = os.stat(inventory_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = load_inventory_cache(inventory_path, stamp)
+        if cached is not None:
+            return cached
         try:
-            with open(inventory_path, 'r') as f:
-                return json.load(f)
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError, so one handler covers both
+            if orjson is not None:
+                with open(inventory_path, 'rb') as f:
+                    inventory = orjson.loads(f.read())
+            else:
+                with open(inventory_path, 'r', encoding='utf-8') as f:
+                    inventory = json.load(f)
+            save_inventory_cache(inventory_path, stamp, inventory)
+            return inventory
         except json.JSONDecodeError as e:
             print(f"\n[FATAL ERROR] Inventory state file is malformed: {inventory_path}")
             print(f"Error Details: {e}")
@@ -2079,16 +2767,127 @@ def load_inventory(inventory_path):
         print(f"  [INIT] No inventory found at {inventory_path}. Starting fresh.")
         return {"branches": {}}
 
-def get_s3_file_age(key):
-    """Returns age of an S3 object in days."""
+def load_inventory_cache(inventory_path, stamp):
+    """
+    Returns the inventory from the '.pkl' sidecar if it was built from the
+    current inventory.json (same mtime and size), otherwise None.
+    """
     try:
-        response = s3_client.head_object(Bucket=S3_BUCKET, Key=key)
-        last_modified = response['LastModified']
-        now = datetime.now(timezone.utc)
-        return (now - last_modified).days
-    except Exception:
+        with open(inventory_path + ".pkl", 'rb') as f:
+            if pickle.load(f) != stamp:
+                return None
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
         return None
 
+def save_inventory_cache(inventory_path, stamp, inventory):
+    """Writes the '.pkl' sidecar atomically. A failed write only costs the next JSON parse."""
+    tmp_path = f"{inventory_path}.pkl.{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(stamp, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(inventory, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, inventory_path + ".pkl")
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def save_inventory(inventory, inventory_path=None, summarize=True):
+    """
+    Writes the inventory to disk, using orjson when available.
+    The data goes to a '.tmp' file that is fsynced and then renamed over the
+    real file, so an interrupted write can never leave inventory.json half written.
+    Callers that kept the branch summaries current themselves (bag commits) pass
+    summarize=False to skip the walk over every leaf.
+    """
+    inventory_path = inventory_path or INVENTORY_FILE
+    tmp_path = inventory_path + ".tmp"
+    with INVENTORY_LOCK:
+        if summarize:
+            summarize_inventory(inventory)
+        if orjson is not None:
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps(inventory, option=orjson.OPT_INDENT_2))
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            # Same bytes as orjson: 2-space indent, non-ASCII paths as UTF-8 rather than \u escapes
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(inventory, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, inventory_path)
+        # The pickle sidecar is stale now; the next load_inventory rebuilds it
+        if os.path.exists(inventory_path + ".pkl"):
+            os.remove(inventory_path + ".pkl")
+
+def compute_branch_summary(leaves):
+    """
+    One pass over a branch's leaves: leaf count, bytes, distinct tar_ids and the newest
+    last_upload (ISO strings sort chronologically).
+    """
+    branch_bytes = 0
+    tids = set()
+    last_upload = None
+    for meta in leaves.values():
+        branch_bytes += meta.get('size_bytes', 0)
+        if meta.get('tar_id'):
+            tids.add(meta['tar_id'])
+        lu = meta.get('last_upload')
+        if lu and (last_upload is None or lu > last_upload):
+            last_upload = lu
+    # 'leaves' lets a reader spot a summary that no longer matches its branch
+    return {"leaves": len(leaves), "bytes": branch_bytes, "bags": len(tids), "last_upload": last_upload}
+
+def branch_summary(data):
+    """The branch's saved '_summary' if it still matches its leaves, otherwise a fresh one."""
+    leaves = data.get('leaves', {})
+    summary = data.get('_summary')
+    if summary and summary.get('leaves') == len(leaves) and 'last_upload' in summary:
+        return summary
+    return compute_branch_summary(leaves)
+
+def summarize_inventory(inventory):
+    """
+    Stores the per-branch totals --report and --show-tree display as '_summary' on each
+    branch, so they read them instead of walking every leaf. Full walk; bag commits use
+    note_bag_commit instead.
+    """
+    for data in inventory.get("branches", {}).values():
+        data['_summary'] = compute_branch_summary(data.get("leaves", {}))
+    # Inventory-wide totals are no longer stored; --report recounts them
+    inventory.pop('_summary', None)
+
+def note_bag_commit(inventory, branch_leaves, upload_iso):
+    """
+    Brings the committing branch's '_summary' up to date in place. A commit only sets
+    last_upload, so a valid summary just moves that forward; otherwise the branch is recounted.
+    """
+    for data in inventory["branches"].values():
+        if data.get("leaves") is branch_leaves:
+            summary = data.get('_summary')
+            if summary and summary.get('leaves') == len(branch_leaves) and 'last_upload' in summary:
+                summary['last_upload'] = max(summary['last_upload'] or upload_iso, upload_iso)
+            else:
+                data['_summary'] = compute_branch_summary(branch_leaves)
+            return
+
+def build_bag_index(inventory):
+    """
+    Single pass over the inventory mapping each tar_id to the leaves it holds, so bag
+    lookups cost O(hits) instead of a scan of every leaf. Entries are in inventory order
+    and 'details' is the live leaf dict (edits through it land in the inventory).
+    Build it per command: it is not updated when leaves are requeued or deleted.
+    Returns: {tar_id: [(branch_key, leaf_key, details), ...]}
+    """
+    bag_index = defaultdict(list)
+    for b_name, b_data in inventory.get("branches", {}).items():
+        for l_key, l_meta in b_data.get("leaves", {}).items():
+            tid = l_meta.get("tar_id")
+            if tid:
+                bag_index[tid].append((b_name, l_key, l_meta))
+    return bag_index
+
 def get_bag_age_and_penalty(inventory, target_bag_id, config):
     # 1. Collect all leaves belonging to this bag
     bag_leaves = []
@@ -2122,11 +2921,13 @@ def get_bag_age_and_penalty(inventory, target_bag_id, config):
     
     return days_old, total_gb, penalty
 
-def perform_rebag(inventory, target_bag_ids, config, is_live, requeue=True):
+def perform_rebag(inventory, target_bag_ids, config, is_live, requeue=True, bag_index=None):
     """
     Resets leaves in specified bags to trigger re-upload.
     Calculates fees using leaf-level metadata.
     """
+    if bag_index is None:
+        bag_index = build_bag_index(inventory)
     print(f"\n--- Rebag Initialization: {', '.join(target_bag_ids)} ---")
     leaves_to_reset = []
     
@@ -2135,6 +2936,8 @@ def perform_rebag(inventory, target_bag_ids, config, is_live, requeue=True):
     encrypt_count = 0
     plain_count = 0
     affected_branches = set()
+    bag_ids = []
+    encrypt_by_branch = {}  # tags are per branch, so parse each branch key once
 
     # 1. Identify leaves and calculate data volume
     for raw_id in target_bag_ids:
@@ -2144,34 +2947,34 @@ def perform_rebag(inventory, target_bag_ids, config, is_live, requeue=True):
         except ValueError:
             print(f"  [ERROR] '{raw_id}' is not a valid Bag ID.")
             continue
+        bag_ids.append(bag_id)
 
-        for branch_key, data in inventory["branches"].items():
+        for branch_key, leaf_key, details in bag_index.get(bag_id, ()):
             # Get metadata for encryption check
-            branch_meta = branch_key.split(" ::")[1:] if " ::" in branch_key else []
-            meta_str = " ".join(branch_meta)
+            will_encrypt = encrypt_by_branch.get(branch_key)
+            if will_encrypt is None:
+                branch_meta = branch_key.split(" ::")[1:] if " ::" in branch_key else []
+                will_encrypt = encrypt_by_branch[branch_key] = check_encryption_needed(" ".join(branch_meta))
 
-            for leaf_key, details in data["leaves"].items():
-                if details.get("tar_id") == bag_id:
-                    affected_branches.add(branch_key)
-                    total_bytes += details.get("size_bytes", 0)
-                    
-                    will_encrypt = check_encryption_needed(meta_str)
-                    if will_encrypt: encrypt_count += 1
-                    else: plain_count += 1
-
-                    leaves_to_reset.append({
-                        'leaves_dict': data["leaves"],
-                        'leaf_key': leaf_key,
-                        's3_key': details.get("archive_key")
-                    })
+            affected_branches.add(branch_key)
+            total_bytes += details.get("size_bytes", 0)
+            
+            if will_encrypt: encrypt_count += 1
+            else: plain_count += 1
+
+            leaves_to_reset.append({
+                'leaves_dict': inventory["branches"][branch_key]["leaves"],
+                'leaf_key': leaf_key,
+                's3_key': details.get("archive_key")
+            })
 
     if not leaves_to_reset:
         print("  [ERROR] No valid leaves found for these bags. Aborting.")
         return False
 
     # 2. Financial Calculation (The Leaf-Aware way)
-    # We reuse your fixed set of bags to get the timeline
-    stats = get_branch_financials(inventory, target_bag_ids, config)
+    # We reuse your fixed set of bags to get the timeline (normalized ids, as stored in tar_id)
+    stats = get_branch_financials(inventory, bag_ids, config, bag_index=bag_index)
     total_gb = total_bytes / (1024**3)
 
     # 3. User Confirmation with your preferred wording
@@ -2200,20 +3003,16 @@ def perform_rebag(inventory, target_bag_ids, config, is_live, requeue=True):
         return False
 
     # 4. Execution: Reset state and delete from S3 (if live)
-    deleted_s3_keys = set()
+    if is_live:
+        # Each bag object once, removed in DeleteObjects batches
+        s3_keys = list(dict.fromkeys(item['s3_key'] for item in leaves_to_reset if item['s3_key']))
+        for s3_key in s3_keys:
+            print(f"  [S3 DELETE]: Removing s3://{config['settings']['s3_bucket']}/{s3_key}")
+        delete_s3_keys(s3_keys, "DELETE_BAG", "DEL-BAG", bucket=config['settings']['s3_bucket'])
+
     for item in leaves_to_reset:
         leaves = item['leaves_dict']
         lk = item['leaf_key']
-        s3_key = item['s3_key']
-
-        if is_live and s3_key and s3_key not in deleted_s3_keys:
-            try:
-                print(f"  [S3 DELETE]: Removing s3://{config['settings']['s3_bucket']}/{s3_key}")
-                response = s3_client.delete_object(Bucket=config['settings']['s3_bucket'], Key=s3_key)
-                log_aws_transaction("DELETE_BAG", s3_key, 0, "N/A", response.get('ResponseMetadata', {}), "DEL-BAG")
-                deleted_s3_keys.add(s3_key)
-            except Exception as e:
-                print(f"  [WARN] Failed to delete {s3_key}: {e}")
 
         # --- THE REQUEUE LOGIC ---
         if requeue:
@@ -2232,11 +3031,13 @@ def perform_rebag(inventory, target_bag_ids, config, is_live, requeue=True):
     # Return the branch key to main() for isolation
     return list(affected_branches)[0] if affected_branches else True
 
-def get_branch_financials(inventory, unique_bags, config):
+def get_branch_financials(inventory, unique_bags, config, bag_index=None):
     """
     Fixed financial calculator: Aggregates data from LEAVES since 
     there is no top-level 'bags' section in the inventory.
     """
+    if bag_index is None:
+        bag_index = build_bag_index(inventory)
     # Pull rates from config with safe fallbacks
     monthly_rate = float(config.get('pricing', 'price_gb_month', fallback=0.00099))
     min_days = int(config.get('pricing', 'min_retention_days', fallback=180))
@@ -2251,39 +3052,40 @@ def get_branch_financials(inventory, unique_bags, config):
 
     now = datetime.now()
     found_any_data = False
-
-    # We must scan all branches to find leaves belonging to the unique_bags set
-    for branch_name, branch_data in inventory.get("branches", {}).items():
-        for leaf_path, details in branch_data.get("leaves", {}).items():
-            bag_id = details.get("tar_id")
+    total_bytes = 0
+    penalty_byte_days = 0   # sum of size * days_remaining; priced once at the end
+    max_days_remaining = 0
+
+    # The bag index holds every leaf of each bag, whichever branch it sits in
+    for bag_id in set(unique_bags):
+        for branch_name, leaf_path, details in bag_index.get(bag_id, ()):
+            found_any_data = True
+            size = details.get("size_bytes", 0)
+            total_bytes += size
             
-            if bag_id in unique_bags:
-                found_any_data = True
-                size = details.get("size_bytes", 0)
-                res["total_bytes"] += size
-                
-                # Check for the last_upload timestamp in the leaf
-                upload_date_str = details.get("last_upload")
-                if upload_date_str:
-                    try:
-                        # Handle ISO format (2026-01-20T12:00:00) 
-                        upload_dt = datetime.fromisoformat(upload_date_str)
-                        # Ensure we are comparing naive to naive or aware to aware
-                        # If your ISO strings aren't timezone aware, we use now()
-                        days_held = (now - upload_dt.replace(tzinfo=None)).days
-                        days_remaining = max(0, min_days - days_held)
-                        
-                        if days_remaining > 0:
-                            leaf_gb = size / (1024**3)
-                            months_rem = days_remaining / 30.0
-                            res["total_penalty"] += (leaf_gb * monthly_rate * months_rem)
-                            
-                            if days_remaining > res["max_days_remaining"]:
-                                res["max_days_remaining"] = days_remaining
-                    except (ValueError, TypeError):
-                        continue
+            # Check for the last_upload timestamp in the leaf
+            upload_date_str = details.get("last_upload")
+            if upload_date_str:
+                try:
+                    # Handle ISO format (2026-01-20T12:00:00) 
+                    upload_dt = parse_iso(upload_date_str)
+                    # Ensure we are comparing naive to naive or aware to aware
+                    # If your ISO strings aren't timezone aware, we use now()
+                    days_held = (now - upload_dt.replace(tzinfo=None)).days
+                    days_remaining = min_days - days_held
+                    
+                    if days_remaining > 0:
+                        penalty_byte_days += size * days_remaining
+                        if days_remaining > max_days_remaining:
+                            max_days_remaining = days_remaining
+                except (ValueError, TypeError):
+                    continue
 
-    res["total_gb"] = res["total_bytes"] / (1024**3)
+    # GB * rate * months, summed over leaves == (byte-days) / 1024^3 * rate / 30
+    res["total_bytes"] = total_bytes
+    res["total_penalty"] = penalty_byte_days / (1024**3) * monthly_rate / 30.0
+    res["max_days_remaining"] = max_days_remaining
+    res["total_gb"] = total_bytes / (1024**3)
     return res
 
 def perform_branch_reset(inventory, search_term, config, is_live, tree_lines):
@@ -2372,18 +3174,16 @@ def perform_branch_reset(inventory, search_term, config, is_live, tree_lines):
     
     # 5. Execution
     if is_live:
-        for s3_key in s3_keys_to_delete:
-            try:
-                print(f"  [S3 DELETE] {s3_key}")
-                response = s3_client.delete_object(Bucket=config['settings']['s3_bucket'], Key=s3_key)
-                log_aws_transaction("DELETE_BRANCH_PURGE", s3_key, 0, "N/A", response.get('ResponseMetadata', {}), "DEL-BCH")
-            except Exception as e:
-                print(f"  [WARN] Failed to delete {s3_key}: {e}")
+        s3_keys = sorted(s3_keys_to_delete)
+        for s3_key in s3_keys:
+            print(f"  [S3 DELETE] {s3_key}")
+        delete_s3_keys(s3_keys, "DELETE_BRANCH_PURGE", "DEL-BCH", bucket=config['settings']['s3_bucket'])
 
         # PURGE: Remove the branch entirely from the inventory memory.
         # This prevents the 'ghost' entry.
         if target_branch in inventory["branches"]:
           del inventory["branches"][target_branch]
+        clear_last_scan(target_branch)
 
         # Clean up any abandoned staging files for this branch
         for f in glob.glob(os.path.join(STAGING_DIR, "stage_*")):
@@ -2396,25 +3196,54 @@ def perform_branch_reset(inventory, search_term, config, is_live, tree_lines):
     
     return target_branch
 
-def find_leaf_owner(file_path, inventory):
+def build_leaf_owner_index(inventory):
+    """
+    Prefix index for find_leaf_owner, built once per search.
+    Returns: ({leaf_path: branch_name}, distinct leaf path lengths, longest first)
+    """
+    owners = {}
+    for branch, data in inventory.get("branches", {}).items():
+        for leaf_path in data.get("leaves", {}):
+            # First branch wins, as in a front-to-back scan
+            owners.setdefault(leaf_path, branch)
+    lengths = sorted({len(leaf_path) for leaf_path in owners}, reverse=True)
+    return owners, lengths
+
+def find_leaf_owner(file_path, inventory, owner_index=None):
     """
     Reverse lookup: Find which Leaf and Branch owns a specific file path.
     Returns: (leaf_path, branch_name)
     """
-    best_leaf = None
-    best_branch = None
+    owners, lengths = owner_index or build_leaf_owner_index(inventory)
     
-    # Iterate through every branch and leaf in the database
-    for branch, data in inventory.get("branches", {}).items():
-        for leaf_path in data.get("leaves", {}):
-            # Check if the file belongs to this leaf (is inside the directory)
-            # We look for the 'longest' match to handle nested paths correctly
-            if file_path.startswith(leaf_path):
-                if best_leaf is None or len(leaf_path) > len(best_leaf):
-                    best_leaf = leaf_path
-                    best_branch = branch
+    # The owner is the longest leaf path that file_path starts with (nested paths resolve
+    # correctly), so probe file_path's prefixes at each leaf length, longest first.
+    for length in lengths:
+        if length > len(file_path):
+            continue
+        branch = owners.get(file_path[:length])
+        if branch is not None:
+            return file_path[:length], branch
                     
-    return best_leaf, best_branch
+    return None, None
+
+def rsync_excludes_for_leaf(leaf_rel_path):
+    """
+    exclude_rules() re-rooted at one leaf, as --exclude-from file content ("" if none apply).
+    Rules under the leaf ("leaf/x") become anchored ("/x"), slash-free rules apply anywhere,
+    other path rules belong to other leaves and are dropped. At the branch root all rules apply.
+    """
+    lines = []
+    pat_prefix = leaf_rel_path + "/"
+    for line in exclude_rules():
+        if line.startswith('#'): continue
+        if not leaf_rel_path:
+            lines.append(line)
+        elif line.startswith(pat_prefix):
+            lines.append("/" + line[len(pat_prefix):])
+        elif "/" not in line:
+            lines.append(line)
+    return "".join(line + "\n" for line in lines)
 
 def stage_remote_leaf(remote_conn, remote_base_path, local_leaf_path, local_branch_root, stage_dir, expected_size=0, hb=None):
     """
@@ -2435,38 +3264,17 @@ def stage_remote_leaf(remote_conn, remote_base_path, local_leaf_path, local_bran
         os.makedirs(stage_dir)
 
     # --- Context-Aware Exclude Logic ---
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    exclude_src = os.path.join(base_dir, "exclude.txt")
     temp_exclude_path = None
     exclude_args = []
 
-    if os.path.exists(exclude_src):
+    leaf_rules = rsync_excludes_for_leaf(leaf_rel_path)
+    if leaf_rules:
         leaf_id = hashlib.md5(local_leaf_path.encode()).hexdigest()[:8]
         temp_exclude_path = os.path.join(STAGING_DIR, f"exclude_{leaf_id}.txt")
-        if not os.path.exists(STAGING_DIR): os.makedirs(STAGING_DIR)
-
-        has_rules = False
-        with open(exclude_src, 'r') as f_in, open(temp_exclude_path, 'w') as f_out:
-            for line in f_in:
-                line = line.strip()
-                if not line or line.startswith('#'): continue
-                
-                # Rewriting logic (Same as before)
-                if not leaf_rel_path:
-                    f_out.write(line + "\n")
-                    has_rules = True
-                    continue
-                pat_prefix = leaf_rel_path + "/"
-                if line.startswith(pat_prefix):
-                    new_pattern = "/" + line[len(pat_prefix):]
-                    f_out.write(new_pattern + "\n")
-                    has_rules = True
-                elif "/" not in line:
-                    f_out.write(line + "\n")
-                    has_rules = True
-
-        if has_rules:
-            exclude_args = ['--exclude-from', temp_exclude_path]
+        ensure_dir(STAGING_DIR)
+        with open(temp_exclude_path, 'w') as f_out:
+            f_out.write(leaf_rules)
+        exclude_args = ['--exclude-from', temp_exclude_path]
     # -----------------------------------
 
     # 3. Build the rsync command
@@ -2619,6 +3427,7 @@ def perform_prune(inventory, do_delete, check_age):
     print(f"Scanning S3 bucket '{S3_BUCKET}' for orphaned leaf bags...")
     paginator = s3_client.get_paginator('list_objects_v2')
     orphans = []
+    now = datetime.now(timezone.utc)
     
     try:
         for page in paginator.paginate(Bucket=S3_BUCKET):
@@ -2627,7 +3436,10 @@ def perform_prune(inventory, do_delete, check_age):
                 # PROTECT SYSTEM ARTIFACTS: Only target .tar outside system/manifests
                 if key.endswith('.tar') and "/system/" not in key and "/manifests/" not in key:
                     if key not in live_bags:
-                        orphans.append(key)
+                        # LIST already carries LastModified, so no per-orphan HEAD is needed for the age
+                        last_modified = obj.get('LastModified')
+                        age_days = (now - last_modified).days if last_modified else None
+                        orphans.append((key, age_days))
     except Exception as e:
         print(f"Error accessing S3: {e}")
         return
@@ -2640,16 +3452,14 @@ def perform_prune(inventory, do_delete, check_age):
 
     # 3. AGE VERIFICATION & STAGING
     keys_to_delete = []
-    for key in orphans:
-        age_days = get_s3_file_age(key)
-        
+    for key, age_days in orphans:
         # Guard against AWS Early Deletion Fees (180-day rule)
         if check_age and age_days is not None and age_days < 180:
             print(f"  [GUARDED] {key} is {age_days}d old (<180). Skipping to avoid fees.")
             continue
         
         if do_delete:
-            keys_to_delete.append({'Key': key})
+            keys_to_delete.append(key)
             print(f"  [STAGING] {key} ({age_days}d old)")
         else:
             print(f"  [DRY RUN] Would delete {key} ({age_days}d old)")
@@ -2657,15 +3467,11 @@ def perform_prune(inventory, do_delete, check_age):
     # 4. EXECUTE BULK DELETE
     if do_delete and keys_to_delete:
         print(f"\nExecuting Bulk Delete ({len(keys_to_delete)} files)...")
-        for i in range(0, len(keys_to_delete), 1000):
-            batch = keys_to_delete[i:i + 1000]
-            try:
-                response = s3_client.delete_objects(Bucket=S3_BUCKET, Delete={'Objects': batch})
-                for item in batch:
-                    log_aws_transaction("PRUNE_CLEANUP", item['Key'], 0, "N/A", response.get('ResponseMetadata', {}), "DEL-PRN")
-                print(f"    Deleted batch of {len(batch)} items.")
-            except Exception as e:
-                print(f"[ERROR] Batch deletion failed: {e}")
+        # Only keys S3 reports as deleted are logged; rejected ones are listed and kept
+        failed = delete_s3_keys(keys_to_delete, "PRUNE_CLEANUP", "DEL-PRN")
+        print(f"    Deleted {len(keys_to_delete) - len(failed)} items.")
+        if failed:
+            print(f"[ERROR] {len(failed)} items could not be deleted.")
         print("  [OK] Pruning complete.")
 
 def show_bag(inventory, target_bag):
@@ -2681,7 +3487,12 @@ def show_bag(inventory, target_bag):
     found_count = 0
     total_bytes = 0
 
-    for branch_name, data in inventory.get('branches', {}).items():
+    # Only the branches that actually hold this bag, in inventory order
+    hits_by_branch = {}
+    for branch_name, path, meta in build_bag_index(inventory).get(target_bag, ()):
+        hits_by_branch.setdefault(branch_name, []).append((path, meta))
+
+    for branch_name, hits in hits_by_branch.items():
         # Better extraction: Get 'user@host:dir' and strip tags
         # Example: 'greenc@acre:/home/greenc/repos'
         branch_clean = branch_name.split(' ::')[0]
@@ -2695,14 +3506,12 @@ def show_bag(inventory, target_bag):
             # Local path handling
             origin = branch_clean.rstrip('/').split('/')[-1]
 
-        leaves = data.get('leaves', {})
-        for path, meta in leaves.items():
-            if meta.get('tar_id') == target_bag:
-                size_str = meta.get('size_human', '0 B')
-                total_bytes += meta.get('size_bytes', 0)
-                # Clip origin to 28 chars to keep columns aligned
-                print(f"{size_str:>12} | {origin[:28]:<28} | {path}")
-                found_count += 1
+        for path, meta in hits:
+            size_str = meta.get('size_human', '0 B')
+            total_bytes += meta.get('size_bytes', 0)
+            # Clip origin to 28 chars to keep columns aligned
+            print(f"{size_str:>12} | {origin[:28]:<28} | {path}")
+            found_count += 1
 
     print("-" * 105)
     if found_count > 0:
@@ -2730,15 +3539,14 @@ def show_leaf(inventory, target_path):
 
     # 2. Find the most recent liverun manifest for this bag
     # Pattern looks for the Bag ID and "liverun" in the filename
-    manifest_pattern = os.path.join("manifests", f"*_{bag_id}_liverun.txt")
-    manifest_files = glob.glob(manifest_pattern)
+    manifest_pattern = os.path.join(MANIFEST_DIR, f"*_{bag_id}_liverun.txt")
 
-    if not manifest_files:
-        print(f"\n[ERROR] No liverun manifest found for {bag_id} in manifests/")
-        return
+    # Newest by filename (they start with YYYYMMDD); max() over the iterator needs no list or sort
+    latest_manifest = max(glob.iglob(manifest_pattern), default=None)
 
-    # Sort by filename (since they start with YYYYMMDD) or mtime to get the newest
-    latest_manifest = sorted(manifest_files)[-1]
+    if not latest_manifest:
+        print(f"\n[ERROR] No liverun manifest found for {bag_id} in {MANIFEST_DIR}")
+        return
 
     print("\n" + "="*100)
     print(f"FILE LIST FOR LEAF: {target_path}")
@@ -2748,17 +3556,12 @@ def show_leaf(inventory, target_path):
     # 3. Read the manifest and filter for the leaf's contents
     found_files = 0
     try:
-        with open(latest_manifest, 'r') as f:
-            for line in f:
-                line = line.strip()
-                # Skip comments and empty lines
-                if line.startswith("#") or not line:
-                    continue
-                
-                # Only show files that are inside the requested leaf directory
-                if line.startswith(target_path):
-                    print(f"  {line}")
-                    found_files += 1
+        # Only show files that are inside the requested leaf directory (comments and blank lines never match)
+        for line in manifest_lines_under(latest_manifest, target_path):
+            if line.startswith("#"):
+                continue
+            print(f"  {line}")
+            found_files += 1
     except OSError as e:
         print(f"Error reading manifest: {e}")
 
@@ -2863,27 +3666,22 @@ def show_tree(inventory):
         if "LOCKED" in tags_raw: tag_short += "L"
         if not tag_short: tag_short = "-"
 
-        # 2. Aggregate Data
-        leaves = data.get('leaves', {})
-        total_bytes = sum(meta.get('size_bytes', 0) for meta in leaves.values())
-        unique_bags = {meta.get('tar_id') for meta in leaves.values() if meta.get('tar_id')}
-        
-        last_date = "NEVER"
-        for meta in leaves.values():
-            lu = meta.get('last_upload')
-            if lu and (last_date == "NEVER" or lu > last_date):
-                last_date = lu
+        # 2. Aggregate Data (saved at the last inventory save; recounted only if the branch changed since)
+        summary = branch_summary(data)
+        total_bytes = summary['bytes']
+        bag_count = summary['bags']
+        last_date = summary['last_upload']
 
-        display_date = last_date.split('T')[0] if last_date != "NEVER" else "NEVER"
+        display_date = last_date.split('T')[0] if last_date else "NEVER"
 
         # 3. Print with consistent alignment
         if len(base_path) > 58:
             # Long path: Print tags and path on line 1, stats on line 2
             print(f"{tag_short:<6} {base_path}")
-            print(f"{'':<6} {'':<60} {len(unique_bags):>6} {format_bytes(total_bytes):>12} {display_date:>18}")
+            print(f"{'':<6} {'':<60} {bag_count:>6} {format_bytes(total_bytes):>12} {display_date:>18}")
         else:
             # Standard path: Everything on one line
-            print(f"{tag_short:<6} {base_path:<60} {len(unique_bags):>6} {format_bytes(total_bytes):>12} {display_date:>18}")
+            print(f"{tag_short:<6} {base_path:<60} {bag_count:>6} {format_bytes(total_bytes):>12} {display_date:>18}")
 
     print("-" * 115)
     print("TAG KEY: (M)utable, (I)mmutable, (C)ompress, (E)ncrypt, (L)ocked")
@@ -2894,13 +3692,6 @@ def log_aws_transaction(action, archive_key, size_bytes, etag, response_metadata
     Appends a permanent, auditable NDJSON record to the transaction ledger.
     Ensures directory existence and immediate disk flushing for audit integrity.
     """
-    # Define log path relative to your config
-    log_dir = os.path.join(os.path.dirname(config_path), 'logs')
-    log_file = os.path.join(log_dir, 'aws.log')
-    
-    # Ensure logs directory exists (mkdir -p logic)
-    os.makedirs(log_dir, exist_ok=True)
-
     entry = {
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "aukive": aukive,
@@ -2923,13 +3714,55 @@ def log_aws_transaction(action, archive_key, size_bytes, etag, response_metadata
     }
 
     try:
-        # Open in append mode; NDJSON (newline-delimited) format
-        with open(log_file, "a") as f:
+        # Append-mode handle shared for the run; NDJSON (newline-delimited) format
+        with AWS_LOG_LOCK:
+            f = open_aws_log()
             f.write(json.dumps(entry) + "\n")
             f.flush()  # Force the OS to commit the write to disk immediately
     except Exception as e:
         # Log failure must not crash the 2.24 TB production transfer
-        print(f"\n    [!] LOGGING ERROR: Could not write to {log_file} ({e})")
+        print(f"\n    [!] LOGGING ERROR: Could not write to {AWS_LOG_FILE} ({e})")
+
+def read_tree_lines(tree_file):
+    """
+    Reads tree.txt once and returns its branch lines stripped, without blanks or comments.
+    This is the single cleaned list shared by main(), the cron scheduler and process_branch.
+    """
+    with open(tree_file, 'r') as f:
+        return TREE_LINE_RE.findall(f.read())
+
+def last_scan_stamp_path(branch_line):
+    """Path of the one-line last-scan stamp kept for a branch in LAST_SCAN_DIR."""
+    return os.path.join(LAST_SCAN_DIR, hashlib.md5(branch_line.encode()).hexdigest()[:16] + ".ts")
+
+def record_last_scan(branch_line, iso_str):
+    """Mirrors a branch's inventory 'last_scan' into its stamp file. Failures are ignored (the stamp is only a hint)."""
+    try:
+        ensure_dir(LAST_SCAN_DIR)
+        with open(last_scan_stamp_path(branch_line), 'w') as f:
+            f.write(iso_str)
+    except OSError:
+        pass
+
+def clear_last_scan(branch_line):
+    """Drops a branch's stamp so the next cron run falls back to the inventory."""
+    stamp_path = last_scan_stamp_path(branch_line)
+    if os.path.exists(stamp_path):
+        os.remove(stamp_path)
+
+def is_branch_fresh_fast(branch_line, config):
+    """
+    Cheap pre-check for cron: True only when the branch's stamp proves it was
+    scanned within the interval. A missing or unreadable stamp returns False,
+    which hands the decision to is_branch_ripe() and the full inventory.
+    """
+    try:
+        with open(last_scan_stamp_path(branch_line), 'r') as f:
+            last_scan_str = f.read().strip()
+        age = int((time.time() - iso_to_epoch(last_scan_str)) // 86400)
+    except (OSError, ValueError):
+        return False
+    return age < get_scan_interval(config)
 
 def is_branch_ripe(branch_line, inventory, config):
     """
@@ -2952,8 +3785,7 @@ def is_branch_ripe(branch_line, inventory, config):
         return True, "[NEW/NEVER SCANNED]"
     
     try:
-        last_scan = datetime.fromisoformat(last_scan_str)
-        age = (datetime.now() - last_scan).days
+        age = int((time.time() - iso_to_epoch(last_scan_str)) // 86400)
         
         if age >= interval_days:
             return True, f"[MATURE] Last scan: {age} days ago (Interval: {interval_days})"
@@ -2963,7 +3795,59 @@ def is_branch_ripe(branch_line, inventory, config):
     except ValueError:
         return True, "[ERROR] Invalid date format in inventory"
 
-def is_action_permitted(branch_line, action):
+def parse_tree_lines(tree_lines):
+    """
+    Splits each tree line once into a (line, path, tags) record.
+    Tags are stripped and upper-cased, ready for is_action_permitted().
+    """
+    records = []
+    for line in tree_lines:
+        parts = line.split(" ::")
+        records.append((line, parts[0].strip(), tuple(t.strip().upper() for t in parts[1:])))
+    return records
+
+# Operations that are forbidden when a branch is in a 'LOCKED' state
+LOCKED_ACTIONS = frozenset(["MIRROR", "FORCE", "DELETE", "REPACK"])
+LOCKED_REASON = "Branch is LOCKED. Remove ::LOCKED from tree.txt to modify or mirror."
+
+def index_tree_lines(tree_lines):
+    """
+    Maps each branch path (the text before ' ::') to its full tree line.
+    """
+    return {line.split(" ::", 1)[0].strip(): line for line in tree_lines}
+
+def lookup_branch_line(target_name, tree_by_path, tree_lines, inventory):
+    """
+    Resolves a CLI branch name to its tree.txt line, or to an inventory key for
+    branches no longer in tree.txt. An exact path hit avoids the substring scans.
+    Returns the matching line/key, or None.
+    """
+    target_line = tree_by_path.get(target_name.split(" ::", 1)[0].strip())
+    if target_line:
+        return target_line
+    target_line = next((l for l in tree_lines if target_name in l), None)
+    if not target_line:
+        target_line = next((k for k in inventory["branches"].keys() if target_name in k), None)
+    return target_line
+
+def index_locked_paths(parsed_tree):
+    """
+    Collects the paths of every ::LOCKED branch from parse_tree_lines() records.
+    """
+    return {path for _, path, tags in parsed_tree if "LOCKED" in tags}
+
+def is_path_locked(branch_line, tree_by_path, locked_paths):
+    """
+    Set-based LOCKED check. tree.txt is authoritative for paths it lists;
+    inventory-only keys fall back to the tags embedded in the key itself.
+    """
+    path = branch_line.split(" ::", 1)[0].strip()
+    if path in tree_by_path:
+        return path in locked_paths
+    return not is_action_permitted(branch_line, "FORCE")[0]
+
+@functools.lru_cache(maxsize=None)
+def is_action_permitted(branch_line, action, tags=None):
     """
     The 'Guard Gate': Evaluates if an operation is permitted based on tree.txt tags.
     
@@ -2972,16 +3856,16 @@ def is_action_permitted(branch_line, action):
     - FORCE:    Destructive reset of S3/Inventory state before a fresh mirror (Hard Mirror).
     - DELETE:  Permanent removal of data from S3 and the local inventory database.
     - REPACK:  Optimization of existing bags to reduce storage waste.
+    
+    The verdict depends only on the arguments, so results are memoized.
     """
-    # Extract tags from the branch line (e.g., ::LOCKED ::COMPRESS)
-    tags = [t.strip().upper() for t in branch_line.split(" ::")[1:]]
+    # Extract tags from the branch line (e.g., ::LOCKED ::COMPRESS) unless pre-parsed
+    if tags is None:
+        tags = [t.strip().upper() for t in branch_line.split(" ::")[1:]]
     is_locked = "LOCKED" in tags
                 
-    # List of operations that are forbidden when a branch is in a 'LOCKED' state
-    restricted_actions = ["MIRROR", "FORCE", "DELETE", "REPACK"]
-
-    if is_locked and action in restricted_actions:
-        return False, "Branch is LOCKED. Remove ::LOCKED from tree.txt to modify or mirror."
+    if is_locked and action in LOCKED_ACTIONS:
+        return False, LOCKED_REASON
     
     return True, None
 
@@ -2996,13 +3880,13 @@ def perform_tree_delete(inventory, config, is_live, tree_lines):
     unlocked_branches = []
     locked_count = 0
 
+    tree_by_path = index_tree_lines(tree_lines)
+    locked_paths = index_locked_paths(parse_tree_lines(tree_lines))
+
     # 1. Sort branches into Unlocked (target) and Locked (safe)
     for b_key in list(inventory.get("branches", {}).keys()):
         # Check tree.txt for the ::LOCKED tag
-        target_line = next((l for l in tree_lines if b_key.split(" ::")[0] in l), b_key)
-        allowed, _ = is_action_permitted(target_line, "FORCE")        
-
-        if allowed:
+        if not is_path_locked(b_key, tree_by_path, locked_paths):
             unlocked_branches.append(b_key)
         else:
             locked_count += 1
@@ -3051,26 +3935,36 @@ def perform_tree_delete(inventory, config, is_live, tree_lines):
 
 def get_tree_size(path):
     """Fast directory summation using scandir for large-scale leaf staging."""
-    total = 0
+    # One stat on the root replaces the exists/isdir/getsize trio
     try:
-        if os.path.exists(path):
-            if os.path.isdir(path):
-                # Using scandir is significantly faster for 250k files than os.walk
-                for entry in os.scandir(path):
-                    if entry.is_file(follow_symlinks=False):
-                        total += entry.stat().st_size
-                    elif entry.is_dir(follow_symlinks=False):
-                        total += get_tree_size(entry.path)
-            else:
-                total = os.path.getsize(path)
-    except (OSError, PermissionError):
-        pass
+        root_st = os.stat(path)
+    except OSError:
+        return 0
+    if not S_ISDIR(root_st.st_mode):
+        return root_st.st_size
+
+    total = 0
+    pending = [path]
+    while pending:
+        try:
+            # Using scandir is significantly faster for 250k files than os.walk
+            with os.scandir(pending.pop()) as it:
+                for entry in it:
+                    # One cached lstat per entry; d_type is not reliable on NFS
+                    st = entry.stat(follow_symlinks=False)
+                    if S_ISREG(st.st_mode):
+                        total += st.st_size
+                    elif S_ISDIR(st.st_mode):
+                        pending.append(entry.path)
+        except OSError:
+            continue
     return total
 
 def run_smart_cron(inventory, tree_lines, config, args, encryption_config=None):
     """
     Rolling Scheduler: Checks 'last_scan' of each branch.
     Only processes branches that have been dormant for > INTERVAL days.
+    Works from the tree_lines already read by main(); tree.txt is not re-opened.
     
     Returns:
         bool: True if any work was performed, False otherwise
@@ -3104,29 +3998,28 @@ def find_eligible_branches(inventory, tree_lines, interval_days):
     
     Args:
         inventory: The inventory dictionary
-        tree_lines: List of branch definitions from tree.txt
+        tree_lines: Cleaned branch definitions from tree.txt (see read_tree_lines)
         interval_days: Minimum age in days to be eligible for scanning
     
     Returns:
-        list: List of eligible branch definitions
+        list: List of eligible branch definitions (with 'allowed' lock state)
     """
     eligible_branches = []
     now = datetime.now()
     
+    # tree_lines from main() are already stripped and comment-free
     for line in tree_lines:
-        line = line.strip()
-        # Skip comments or empty lines
-        if not line or line.startswith("#"):
-            continue
-            
         # Get branch status and decision
         should_scan, reason = is_branch_due_for_scan(inventory, line, interval_days, now)
         
-        # Add to eligible list if needed
+        # Add to eligible list if needed, resolving the lock state up front
         if should_scan:
+            allowed, lock_msg = is_action_permitted(line, "MIRROR")
             eligible_branches.append({
                 'line': line,
-                'reason': reason
+                'reason': reason,
+                'allowed': allowed,
+                'lock_msg': lock_msg
             })
     
     return eligible_branches
@@ -3157,10 +4050,9 @@ def is_branch_due_for_scan(inventory, branch_line, interval_days, current_time=N
     if not last_scan_str:
         return True, "[NEW/NEVER SCANNED]"
     
-    # Check age
+    # Check age (timestamps are parsed once and cached as epoch seconds)
     try:
-        last_scan = datetime.fromisoformat(last_scan_str)
-        age_days = (current_time - last_scan).days
+        age_days = int((current_time.timestamp() - iso_to_epoch(last_scan_str)) // 86400)
         
         if age_days >= interval_days:
             return True, f"[MATURE] Last scan: {age_days} days ago (Interval: {interval_days})"
@@ -3186,21 +4078,21 @@ def process_eligible_branches(eligible_branches, inventory, tree_lines, args, en
     if not eligible_branches:
         return False
     
+    # Locked branches were flagged by find_eligible_branches; drop them in one pass
+    runnable = [b for b in eligible_branches if b.get('allowed', True)]
+    locked_count = len(eligible_branches) - len(runnable)
+    if locked_count:
+        print(f"\n    [SKIPPING] {locked_count} eligible branch(es) are LOCKED.")
+    
     run_count = 0
     
-    for branch in eligible_branches:
+    for branch in runnable:
         line = branch['line']
         reason = branch['reason']
         
         print(f"\n>>> TRIGGERING: {line}")
         print(f"    Reason: {reason}")
         
-        # Check if branch is locked
-        allowed, msg = is_action_permitted(line, "MIRROR")
-        if not allowed:
-            print(f"    [SKIPPING] {msg}")
-            continue
-        
         # Initialize stats tracking for this branch
         branch_stats = {}
         
@@ -3268,24 +4160,24 @@ def get_restore_targets(args, inventory):
             print(f"[ERROR] Manifest directory missing: {MANIFEST_DIR}")
             sys.exit(1)
 
-        manifests = [f for f in os.listdir(MANIFEST_DIR) if f.endswith(".txt")]
+        with os.scandir(MANIFEST_DIR) as it:
+            manifests = [e for e in it if e.name.endswith(".txt") and e.is_file(follow_symlinks=False)]
         
-        for manifest in tqdm(manifests, desc="  Scanning Manifests", unit="file", leave=False):
+        term_lower = search_term.lower()
+
+        for entry in tqdm(manifests, desc="  Scanning Manifests", unit="file", leave=False):
+            manifest = entry.name
+            # Extract Bag ID from filename (e.g. 20260125_hostname_bag_00045_liverun.txt)
+            # We assume standard naming: ..._bag_XXXXX...
+            if "_bag_" not in manifest:
+                continue
             try:
-                path = os.path.join(MANIFEST_DIR, manifest)
-                with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                    for line in f:
-                        if search_term.lower() in line.lower():
-                            # Extract Bag ID from filename (e.g. 20260125_hostname_bag_00045_liverun.txt)
-                            # We assume standard naming: ..._bag_XXXXX...
-                            if "_bag_" in manifest:
-                                parts = manifest.split("_bag_")
-                                if len(parts) > 1:
-                                    # Extract "00045"
-                                    raw_id = parts[1].split("_")[0]
-                                    found_bag_id = f"bag_{int(raw_id):05d}"
-                                    exact_file_path = line.strip()
-                                    break
+                match = find_in_manifest(entry.path, term_lower)
+                if match is not None:
+                    # Extract "00045"
+                    raw_id = manifest.split("_bag_")[1].split("_")[0]
+                    found_bag_id = f"bag_{int(raw_id):05d}"
+                    exact_file_path = match
             except: continue
             if found_bag_id: break
         
@@ -3342,12 +4234,23 @@ def get_restore_targets(args, inventory):
         target_branch = args.restore_branch
         print(f"\n--- Smart Restore: Resolving Branch '{target_branch}' ---")
         
-        # Fuzzy match the branch name
+        # Fuzzy match the branch name (one pass; exact path wins, otherwise must be unique)
+        branches = inventory.get("branches", {})
         matched_key = None
-        for k in inventory.get("branches", {}).keys():
-            if target_branch in k: 
-                matched_key = k
+        matches = []
+        for k in branches:
+            if target_branch == k or target_branch == k.split(" ::")[0]:
+                matches = [k]
                 break
+            if target_branch in k:
+                matches.append(k)
+        
+        if len(matches) > 1:
+            print(f"  [AMBIGUOUS] Multiple branches match '{target_branch}':")
+            for m in matches: print(f"    - {m}")
+            sys.exit(1)
+        if matches:
+            matched_key = matches[0]
         
         if matched_key:
             print(f"  [MATCH] Found: {matched_key}")
@@ -3410,13 +4313,11 @@ def check_s3_restore_status(bucket, key):
         if restore_string is None:
             return 'FROZEN'
             
-        if 'ongoing-request="true"' in restore_string:
-            return 'PENDING'
+        match = RESTORE_ONGOING_RE.search(restore_string)
+        if not match:
+            return 'FROZEN' # Fallback
             
-        if 'ongoing-request="false"' in restore_string:
-            return 'READY'
-            
-        return 'FROZEN' # Fallback
+        return 'PENDING' if match.group(1) == 'true' else 'READY'
 
     except Exception as e:
         print(f"  [ERROR] Failed to check status of {key}: {e}")
@@ -3438,27 +4339,61 @@ def initiate_thaw(bucket, key, tier):
         print(f"  [ERROR] Thaw request failed: {e}")
         return False
 
-def process_local_restore(bag_path, dest_root, passphrase_file, specific_files=None):
+def stream_bag_to_staging(s3_bucket, key, bag_id):
     """
-    Function New #3: The Pipeline Manager.
-    1. Unpacks the outer Bag.
-    2. Identifies leaves (Encrypted? Compressed?).
-    3. Processes them into the destination.
+    Pipes the S3 object body straight into 'tar -x' in a fresh staging folder.
+    The outer bag never lands on disk as a .tar, so its bytes are written only once.
+    
+    Returns:
+        str: Path to the staging folder holding the unpacked leaves
     """
     # 1. Create a temp zone for the Bag contents
-    bag_id = os.path.basename(bag_path).replace(".tar", "")
     temp_dir = os.path.join(STAGING_DIR, f"restore_{bag_id}")
     if os.path.exists(temp_dir): shutil.rmtree(temp_dir)
     os.makedirs(temp_dir)
 
-    print(f"  [PROCESS] Unpacking bag to staging area...")
+    # 2. Stream S3 -> tar stdin. Bags are written in TAR_BLOCKING_FACTOR records; tar reading
+    # stdin accepts short records, so bags written with tar's default record size unpack too.
     try:
-        subprocess.run(["tar", "-xf", bag_path, "-C", temp_dir], check=True)
-    except subprocess.CalledProcessError:
-        print("  [FATAL] Failed to unpack bag. Corrupt download?")
-        return
+        obj = s3_client.get_object(Bucket=s3_bucket, Key=key)
+        body = obj['Body']
+        tar_proc = subprocess.Popen(["tar", "-b", str(TAR_BLOCKING_FACTOR), "-xf", "-", "-C", temp_dir], stdin=subprocess.PIPE)
+        try:
+            with tqdm(total=obj.get('ContentLength'), unit='B', unit_scale=True, desc="  Downloading") as pbar:
+                for chunk in body.iter_chunks(16 * 1024 * 1024):
+                    try:
+                        tar_proc.stdin.write(chunk)
+                    except BrokenPipeError:
+                        # tar exits at the end-of-archive marker; whatever follows is record padding.
+                        # Its exit code below says whether the archive was complete.
+                        break
+                    pbar.update(len(chunk))
+        finally:
+            try:
+                tar_proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            tar_proc.wait()
+            body.close()
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    if tar_proc.returncode != 0:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise RuntimeError("Failed to unpack bag stream. Corrupt download?")
 
+    return temp_dir
+
+def process_local_restore(temp_dir, dest_root, passphrase_file, specific_files=None):
+    """
+    Function New #3: The Pipeline Manager.
+    1. Takes the unpacked outer Bag (see stream_bag_to_staging).
+    2. Identifies leaves (Encrypted? Compressed?).
+    3. Processes them into the destination.
+    """
     # 2. Walk the leaves found inside
+    leaf_jobs = []
     for root, dirs, files in os.walk(temp_dir):
         for file in files:
             leaf_path = os.path.join(root, file)
@@ -3469,68 +4404,98 @@ def process_local_restore(bag_path, dest_root, passphrase_file, specific_files=N
             final_dest = os.path.join(dest_root, rel_dir)
             if not os.path.exists(final_dest): os.makedirs(final_dest)
 
-            # PIPELINE CONSTRUCTION
-            # We build a command string based on extensions
-            cmd_pipeline = []
-            
-            # INPUT: The file on disk
-            current_input = shlex.quote(leaf_path)
-            
-            # STAGE 1: Decryption
-            if file.endswith(".gpg"):
-                if not passphrase_file:
-                    print(f"  [SKIP] Encrypted leaf found but no key.txt: {file}")
-                    continue
-                # gpg -d --passphrase-file key.txt --batch [INPUT]
-                cmd_pipeline.append(f"gpg -d --quiet --batch --passphrase-file {shlex.quote(passphrase_file)} {current_input}")
-                current_input = "-" # Subsequent commands read from stdin
-            
-            # STAGE 2: Decompression
-            # Check file name stripped of .gpg (e.g., leaf.tar.gz.gpg -> leaf.tar.gz)
-            base_name = file.replace(".gpg", "")
-            if base_name.endswith(".gz") or base_name.endswith(".tgz"):
-                if cmd_pipeline:
-                    cmd_pipeline.append("gunzip")
-                else:
-                    cmd_pipeline.append(f"gunzip -c {current_input}")
-                    current_input = "-"
-
-            # STAGE 3: Extraction (Untar)
-            # Standard tar extraction reading from Stdin or File
-            # 1. Cleanly quote the destination directory
-            safe_dest = shlex.quote(final_dest)
-            extract_cmd = f"tar -x -C {safe_dest}"
-
-            # 2. Build file arguments safely
-            if specific_files:
-                # Use shlex.quote on every individual filename to handle spaces/apostrophes
-                quoted_files = [shlex.quote(os.path.basename(f)) for f in specific_files]
-                file_args = " ".join(quoted_files)
-                extract_cmd += f" {file_args}"
-
-            if cmd_pipeline:
-                # Chain: GPG | GUNZIP | TAR
-                cmd_pipeline.append(extract_cmd)
-                full_cmd = " | ".join(cmd_pipeline)
-            else:
-                # Direct Tar: tar -xf file.tar -C dest [files...]
-                # Note: current_input should have been quoted when it was defined!
-                full_cmd = f"tar -xf {current_input} -C {safe_dest}"
-                if specific_files:
-                    full_cmd += f" {file_args}"
-
-            # EXECUTE
-            print(f"  [EXTRACT] Processing leaf: {file}")
-            try:
-                # Now full_cmd is a perfectly escaped shell string
-                subprocess.run(full_cmd, shell=True, check=True, stderr=subprocess.PIPE)
-            except subprocess.CalledProcessError as e:
-                print(f"  [ERROR] Failed to extract {file}: {e.stderr.decode().strip()}")
+            leaf_jobs.append((leaf_path, final_dest))
 
+    # 3. Run the leaf pipelines concurrently (gpg/gunzip/tar are external processes)
+    max_workers = min(os.cpu_count() or 1, 8)
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = {
+            ex.submit(extract_restored_leaf, leaf_path, final_dest, passphrase_file, specific_files): leaf_path
+            for leaf_path, final_dest in leaf_jobs
+        }
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"  [ERROR] Failed to extract {os.path.basename(futures[future])}: {e}")
 
     # Cleanup staging
     shutil.rmtree(temp_dir)
 
+def extract_restored_leaf(leaf_path, final_dest, passphrase_file, specific_files=None):
+    """
+    Runs the Decrypt -> Decompress -> Untar pipeline for a single leaf.
+    Safe to call from worker threads; all heavy lifting happens in subprocesses.
+    """
+    file = os.path.basename(leaf_path)
+
+    # PIPELINE CONSTRUCTION
+    # We build a command string based on extensions
+    cmd_pipeline = []
+    
+    # INPUT: The file on disk
+    current_input = shlex.quote(leaf_path)
+    
+    # STAGE 1: Decryption
+    if file.endswith(".gpg"):
+        if not passphrase_file:
+            print(f"  [SKIP] Encrypted leaf found but no key.txt: {file}")
+            return False
+        # gpg -d --passphrase-file key.txt --batch [INPUT]
+        cmd_pipeline.append(f"gpg -d --quiet --batch --passphrase-file {shlex.quote(passphrase_file)} {current_input}")
+        current_input = "-" # Subsequent commands read from stdin
+    
+    # STAGE 2: Decompression
+    # Check file name stripped of .gpg (e.g., leaf.tar.gz.gpg -> leaf.tar.gz)
+    # Chosen by extension, not the current compressor setting, so older bags still restore
+    base_name = file.replace(".gpg", "")
+    decompress = None
+    if base_name.endswith(".tgz"):
+        decompress = COMPRESSORS["gzip"]["decompress"]
+    for comp in COMPRESSORS.values():
+        if base_name.endswith(comp["ext"]):
+            decompress = comp["decompress"]
+    if decompress:
+        if cmd_pipeline:
+            cmd_pipeline.append(decompress)
+        else:
+            cmd_pipeline.append(f"{decompress} {current_input}")
+            current_input = "-"
+
+    # STAGE 3: Extraction (Untar)
+    # Standard tar extraction reading from Stdin or File
+    # 1. Cleanly quote the destination directory
+    safe_dest = shlex.quote(final_dest)
+    extract_cmd = f"tar -x -C {safe_dest}"
+
+    # 2. Build file arguments safely
+    if specific_files:
+        # Use shlex.quote on every individual filename to handle spaces/apostrophes
+        quoted_files = [shlex.quote(os.path.basename(f)) for f in specific_files]
+        file_args = " ".join(quoted_files)
+        extract_cmd += f" {file_args}"
+
+    if cmd_pipeline:
+        # Chain: GPG | GUNZIP | TAR
+        cmd_pipeline.append(extract_cmd)
+        full_cmd = " | ".join(cmd_pipeline)
+    else:
+        # Direct Tar: tar -xf file.tar -C dest [files...]
+        # Note: current_input should have been quoted when it was defined!
+        full_cmd = f"tar -xf {current_input} -C {safe_dest}"
+        if specific_files:
+            full_cmd += f" {file_args}"
+
+    # EXECUTE
+    print(f"  [EXTRACT] Processing leaf: {file}")
+    try:
+        # Now full_cmd is a perfectly escaped shell string
+        subprocess.run(full_cmd, shell=True, check=True, stderr=subprocess.PIPE)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"  [ERROR] Failed to extract {file}: {e.stderr.decode().strip()}")
+        return False
+
 def perform_restore_orchestration(restore_jobs, config, passphrase_file):
     """
     Function New #4: The Conductor.
@@ -3571,25 +4536,13 @@ def perform_restore_orchestration(restore_jobs, config, passphrase_file):
             print(f"  [READY] Downloading...")
             ready_count += 1
             
-            # Download to STAGING_DIR/bag_ID.tar
-            local_tar = os.path.join(STAGING_DIR, f"{bag_id}.tar")
-            
             try:
-                # Visual download bar
-                file_size = s3_client.head_object(Bucket=s3_bucket, Key=key)['ContentLength']
-                with tqdm(total=file_size, unit='B', unit_scale=True, desc="  Downloading") as pbar:
-                    s3_client.download_file(
-                        s3_bucket, 
-                        key, 
-                        local_tar,
-                        Callback=lambda bytes_transferred: pbar.update(bytes_transferred)
-                    )
+                # Stream the bag into STAGING_DIR/restore_bag_ID/ (no intermediate .tar)
+                temp_dir = stream_bag_to_staging(s3_bucket, key, bag_id)
                 
                 # Process the bag
-                process_local_restore(local_tar, dest, passphrase_file, job['files_to_extract'])
+                process_local_restore(temp_dir, dest, passphrase_file, job['files_to_extract'])
                 
-                # Cleanup download
-                os.remove(local_tar)
                 print(f"  [SUCCESS] Data restored to {dest}")
                 
             except Exception as e:
@@ -3611,13 +4564,13 @@ def cleanup_staging_dir(staging_path):
     if not os.path.exists(staging_path):
         return
         
-    # 1. Identify all matching items first
-    patterns = ["comp_*", "stage_*", "enc_*", "bundle_*", "*.tar"]
-    items_to_delete = []
-    
-    for pattern in patterns:
-        full_pattern = os.path.join(staging_path, pattern)
-        items_to_delete.extend(glob.glob(full_pattern))
+    # 1. Identify all matching items first (one directory pass)
+    prefixes = ("comp_", "stage_", "enc_", "bundle_")
+    with os.scandir(staging_path) as it:
+        items_to_delete = [
+            e.path for e in it
+            if not e.name.startswith(".") and (e.name.startswith(prefixes) or e.name.endswith(".tar"))
+        ]
 
     # 2. Only proceed with printing if there's work to do
     if not items_to_delete:
@@ -3626,21 +4579,45 @@ def cleanup_staging_dir(staging_path):
     print(f"  [INIT] Clearing staging directory: {staging_path}")
     deleted_count = 0
     
-    try:
-        for item in items_to_delete:
-            if os.path.isdir(item):
-                shutil.rmtree(item)
-            else:
-                os.remove(item)
-            deleted_count += 1
-        
-        print(f"  [OK] Cleaned {deleted_count} orphaned items.")
-            
-    except Exception as e:
-        print(f"  [WARN] Startup cleanup encountered an issue: {e}")
+    # Removal is syscall-latency bound, so several trees can be unlinked at once
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        futures = [ex.submit(remove_staging_item, item) for item in items_to_delete]
+        for future in futures:
+            try:
+                future.result()
+                deleted_count += 1
+            except Exception as e:
+                print(f"  [WARN] Startup cleanup encountered an issue: {e}")
+    
+    print(f"  [OK] Cleaned {deleted_count} orphaned items.")
+
+def remove_staging_item(path):
+    """Deletes a single staging file or directory tree."""
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+STAGING_CLEANED = {'done': False}
+
+def cleanup_staging_once():
+    """Runs cleanup_staging_dir the first time real work needs the staging area, then never again."""
+    if not STAGING_CLEANED['done']:
+        cleanup_staging_dir(STAGING_DIR)
+        STAGING_CLEANED['done'] = True
+
+ENCRYPTION_CONFIG_CACHE = {}
 
 def load_encryption_config(config_file):
-    """Load encryption configuration from the config file"""
+    """Load encryption configuration from the config file (cached on path, mtime and size)"""
+    try:
+        st = os.stat(config_file)
+        cache_key = (config_file, st.st_mtime_ns, st.st_size)
+    except OSError:
+        cache_key = None
+    if cache_key in ENCRYPTION_CONFIG_CACHE:
+        return ENCRYPTION_CONFIG_CACHE[cache_key]
+
     config = configparser.ConfigParser()
     config.read(config_file)
     
@@ -3654,8 +4631,35 @@ def load_encryption_config(config_file):
         encryption['method'] = 'password'
         encryption['password_file'] = 'key.txt'
         
+    if cache_key:
+        ENCRYPTION_CONFIG_CACHE[cache_key] = encryption
     return encryption
 
+def run_gpg_with_passphrase(cmd, password):
+    """
+    Runs a gpg command, handing it the passphrase through an anonymous pipe (--passphrase-fd).
+    The passphrase never touches the filesystem.
+    """
+    read_fd, write_fd = os.pipe()
+    try:
+        os.write(write_fd, password.encode() + b"\n")
+        os.close(write_fd)
+        write_fd = None
+        full_cmd = cmd[:1] + ["--passphrase-fd", str(read_fd), "--pinentry-mode", "loopback"] + cmd[1:]
+        subprocess.run(full_cmd, pass_fds=(read_fd,), check=True)
+    finally:
+        os.close(read_fd)
+        if write_fd is not None:
+            os.close(write_fd)
+
+def read_password_file(password_file):
+    """Reads the passphrase for password-based GPG operations."""
+    if not os.path.exists(password_file):
+        raise FileNotFoundError(f"Password file not found: {password_file}")
+    
+    with open(password_file, 'r') as f:
+        return f.read().strip()
+
 def encrypt_file(input_file, output_file, config):
     """Encrypt a file using GPG based on configuration"""
     if config['method'] == 'key':
@@ -3669,33 +4673,15 @@ def encrypt_file(input_file, output_file, config):
         subprocess.run(cmd, check=True)
     else:
         # Use password-based encryption
-        password_file = config['password_file']
-        if not os.path.exists(password_file):
-            raise FileNotFoundError(f"Password file not found: {password_file}")
-        
-        with open(password_file, 'r') as f:
-            password = f.read().strip()
-        
-        # Create a temporary batch file with the passphrase
-        with tempfile.NamedTemporaryFile('w', delete=False) as batch_file:
-            batch_file.write(f"%echo Encrypting\n")
-            batch_file.write(f"passphrase {password}\n")
-            batch_file.write(f"%commit\n")
-            batch_path = batch_file.name
-        
-        try:
-            cmd = [
-                "gpg", "--batch", "--yes",
-                "--passphrase-file", batch_path,
-                "--symmetric",
-                "--cipher-algo", "AES256",
-                "--output", output_file,
-                "--encrypt", input_file
-            ]
-            subprocess.run(cmd, check=True)
-        finally:
-            # Securely delete the temporary batch file
-            os.unlink(batch_path)
+        password = read_password_file(config['password_file'])
+        cmd = [
+            "gpg", "--batch", "--yes",
+            "--symmetric",
+            "--cipher-algo", "AES256",
+            "--output", output_file,
+            input_file
+        ]
+        run_gpg_with_passphrase(cmd, password)
 
 def decrypt_file(input_file, output_file, config):
     """Decrypt a file using GPG based on configuration"""
@@ -3709,31 +4695,13 @@ def decrypt_file(input_file, output_file, config):
         subprocess.run(cmd, check=True)
     else:
         # Password-based decryption
-        password_file = config['password_file']
-        if not os.path.exists(password_file):
-            raise FileNotFoundError(f"Password file not found: {password_file}")
-            
-        with open(password_file, 'r') as f:
-            password = f.read().strip()
-        
-        # Create a temporary batch file with the passphrase
-        with tempfile.NamedTemporaryFile('w', delete=False) as batch_file:
-            batch_file.write(f"%echo Decrypting\n")
-            batch_file.write(f"passphrase {password}\n")
-            batch_file.write(f"%commit\n")
-            batch_path = batch_file.name
-            
-        try:
-            cmd = [
-                "gpg", "--batch", "--yes",
-                "--passphrase-file", batch_path,
-                "--output", output_file,
-                "--decrypt", input_file
-            ]
-            subprocess.run(cmd, check=True)
-        finally:
-            # Securely delete the temporary batch file
-            os.unlink(batch_path)
+        password = read_password_file(config['password_file'])
+        cmd = [
+            "gpg", "--batch", "--yes",
+            "--output", output_file,
+            "--decrypt", input_file
+        ]
+        run_gpg_with_passphrase(cmd, password)
 
 def generate_gpg_key():
     """Generate a new GPG key pair for backup encryption"""
@@ -3801,44 +4769,49 @@ def export_gpg_key(output_file, key_id, private=False):
         print(f"Error exporting key: {e}")
         return False
 
-def main():
-
-    parser = argparse.ArgumentParser(
-        description=f"{SYSTEM_NAME} v{VERSION}\n{SYSTEM_DESCRIPTION}", 
-        formatter_class=argparse.RawTextHelpFormatter
-    )
+# --- CLI PARSER ---
 
+def add_mirror_arguments(parser):
     # --- 1. MIRRORING SUITE ---
     mirror_group = parser.add_argument_group('Mirroring')
-    mirror_group.add_argument("--mirror-tree", action="store_true", help="Mirror all unlocked branches (default action)")
-    mirror_group.add_argument("--mirror-branch", type=str, metavar='NAME', help="Mirror a specific branch to S3")
-    mirror_group.add_argument("--mirror-bag", nargs='+', metavar='ID', help="Mirror specific bag IDs to S3")
+    # One mirror target per run; argparse rejects combinations while parsing
+    mirror_target = mirror_group.add_mutually_exclusive_group()
+    mirror_target.add_argument("--mirror-tree", action="store_true", help="Mirror all unlocked branches (default action)")
+    mirror_target.add_argument("--mirror-branch", type=str, metavar='NAME', help="Mirror a specific branch to S3")
+    mirror_target.add_argument("--mirror-bag", nargs='+', metavar='ID', help="Mirror specific bag IDs to S3")
     mirror_group.add_argument("--force-reset", action="store_true", help="With --mirror: Wipe S3 + Inventory then mirror.")
     mirror_group.add_argument("--cron", action="store_true", help="Only runs if older than scan_interval_days (glacier.cfg)")
     mirror_group.add_argument('--interval', type=int, help='Override scan_interval_days for use with --cron')
 
+def add_restore_arguments(parser):
     # --- 2. RESTORE SUITE ---
     restore_group = parser.add_argument_group('Restoring')
-    restore_group.add_argument("--restore-file", type=str, metavar="FILENAME", help="Find and recover a specific file")
-    restore_group.add_argument("--restore-bag", nargs='+', metavar="BAG_ID", help="Recover specific bag(s)")
-    restore_group.add_argument("--restore-branch", type=str, metavar="PATH", help="Recover a branch")
-    restore_group.add_argument("--restore-tree", action="store_true", help="Recover all branches")
+    restore_target = restore_group.add_mutually_exclusive_group()
+    restore_target.add_argument("--restore-file", type=str, metavar="FILENAME", help="Find and recover a specific file")
+    restore_target.add_argument("--restore-bag", nargs='+', metavar="BAG_ID", help="Recover specific bag(s)")
+    restore_target.add_argument("--restore-branch", type=str, metavar="PATH", help="Recover a branch")
+    restore_target.add_argument("--restore-tree", action="store_true", help="Recover all branches")
     restore_group.add_argument("--to", type=str, metavar="PATH", help="Destination directory (Required for restore)")
     restore_group.add_argument("--tier", type=str, choices=["Standard", "Bulk"], default="Standard", help="AWS Retrieval Tier (Default: Standard)")
 
+def add_delete_arguments(parser):
     # --- 3. DELETE SUITE ---
     delete_group = parser.add_argument_group('Deleting')
-    delete_group.add_argument("--delete-bag", nargs='+', metavar="ID", help="Delete bag(s) from S3 and inventory")
-    delete_group.add_argument("--delete-branch", type=str, metavar="NAME", help="Delete a branch from S3 and inventory")
-    delete_group.add_argument("--delete-tree", action="store_true", help="Delete all unlocked branches from S3 and inventory")
+    delete_target = delete_group.add_mutually_exclusive_group()
+    delete_target.add_argument("--delete-bag", nargs='+', metavar="ID", help="Delete bag(s) from S3 and inventory")
+    delete_target.add_argument("--delete-branch", type=str, metavar="NAME", help="Delete a branch from S3 and inventory")
+    delete_target.add_argument("--delete-tree", action="store_true", help="Delete all unlocked branches from S3 and inventory")
 
+def add_view_arguments(parser):
     # --- 4. VIEW SUITE ---
     view_group = parser.add_argument_group('Showing')
-    view_group.add_argument('--show-tree', action='store_true', help='Show archive tree')
-    view_group.add_argument('--show-branch', type=str, metavar="NAME", help='Show branch contents')
-    view_group.add_argument('--show-leaf', type=str, metavar="PATH", help='Show leaf contents')
-    view_group.add_argument('--show-bag', type=str, metavar="ID", help='Show leaves in a bag')
+    view_target = view_group.add_mutually_exclusive_group()
+    view_target.add_argument('--show-tree', action='store_true', help='Show archive tree')
+    view_target.add_argument('--show-branch', type=str, metavar="NAME", help='Show branch contents')
+    view_target.add_argument('--show-leaf', type=str, metavar="PATH", help='Show leaf contents')
+    view_target.add_argument('--show-bag', type=str, metavar="ID", help='Show leaves in a bag')
 
+def add_gpg_arguments(parser):
     # --- 5. GPG MANAGEMENT
     key_group = parser.add_argument_group('GPG Management')
     key_group.add_argument('--generate-gpg-key', action='store_true', help='Generate a new GPG key pair for backup encryption')
@@ -3846,6 +4819,7 @@ def main():
     key_group.add_argument('--export-key', metavar='FILE', help='Export a GPG key to a file')
     key_group.add_argument('--key-type', choices=['public', 'private'], default='public', help='Type of key to export (default: public)')
 
+def add_maintenance_arguments(parser):
     # --- 6. MAINTENANCE ---
     mgmt_group = parser.add_argument_group('Maintenance')
     mgmt_group.add_argument("--run", action="store_true", help="Trigger live-run (otherwise dry-run)")
@@ -3857,16 +4831,74 @@ def main():
     mgmt_group.add_argument("--prune", action="store_true", help="Remove orphaned S3 bags")
     mgmt_group.add_argument("--tree-file", default=DEFAULT_TREE_FILE, help=f"Path to tree definition file (default: {DEFAULT_TREE_FILE})")
 
+ALL_ARGUMENT_GROUPS = (
+    add_mirror_arguments, add_restore_arguments, add_delete_arguments,
+    add_view_arguments, add_gpg_arguments, add_maintenance_arguments
+)
+
+# Read-only verbs that main() dispatches (and exits on) before it reads any
+# restore/delete/GPG option, so those groups never need to be built for them.
+FAST_PATH_VERBS = {"--show-tree", "--show-branch", "--show-leaf", "--show-bag", "--find", "--report", "--audit"}
+FAST_PATH_GROUPS = (add_mirror_arguments, add_view_arguments, add_maintenance_arguments)
+# Defaults of every option in the groups FAST_PATH_GROUPS leaves out, so a trimmed parse has the
+# same attributes as a full one without building those groups. Keep in step with the add_*_arguments above.
+FAST_PATH_OMITTED_DEFAULTS = {
+    "restore_file": None, "restore_bag": None, "restore_branch": None, "restore_tree": False,
+    "to": None, "tier": "Standard",
+    "delete_bag": None, "delete_branch": None, "delete_tree": False,
+    "generate_gpg_key": False, "show_key_id": False, "export_key": None, "key_type": "public",
+}
+
+def build_arg_parser(groups=ALL_ARGUMENT_GROUPS, allow_abbrev=True):
+    parser = argparse.ArgumentParser(
+        description=f"{SYSTEM_NAME} v{VERSION}\n{SYSTEM_DESCRIPTION}", 
+        formatter_class=argparse.RawTextHelpFormatter,
+        allow_abbrev=allow_abbrev
+    )
+    for add_group in groups:
+        add_group(parser)
+    return parser
+
+def parse_cli_args(argv):
+    """
+    Parses the command line. Read-only verbs get a trimmed parser; anything the
+    trimmed parser cannot fully account for (help, abbreviations, other flags)
+    falls through to the full parser so usage and error messages stay identical.
+    """
+    flags = {tok.split("=", 1)[0] for tok in argv if tok.startswith("--")}
+    if flags & FAST_PATH_VERBS and not {"-h", "--help"} & set(argv):
+        fast_parser = build_arg_parser(FAST_PATH_GROUPS, allow_abbrev=False)
+
+        # Report parse errors through the full parser rather than the trimmed usage
+        def defer_error(message):
+            raise ValueError(message)
+        fast_parser.error = defer_error
+
+        try:
+            args, extras = fast_parser.parse_known_args(argv)
+            if not extras:
+                for dest, default in FAST_PATH_OMITTED_DEFAULTS.items():
+                    setattr(args, dest, default)
+                return args
+        except ValueError:
+            pass
+
+    parser = build_arg_parser()
+
     # If no arguments are provided print full help
-    if len(sys.argv) == 1:
+    if not argv:
         parser.print_help()
         sys.exit(0)
 
-    args = parser.parse_args()
+    return parser.parse_args(argv)
+
+def main():
+
+    args = parse_cli_args(sys.argv[1:])
 
     # --- SELECTIVE SILENCE BUFFER ---
-    # Capture all stdout. Only release it if work is performed or an error occurs.
-    buffer = io.StringIO()
+    # Capture all stdout (bounded, see RingBuffer). Only release it if work is performed or an error occurs.
+    buffer = RingBuffer()
     original_stdout = sys.stdout
     sys.stdout = buffer
     is_unmuzzled = False
@@ -3878,31 +4910,50 @@ def main():
             print(buffer.getvalue(), end='') # Flush captured buffer
             is_unmuzzled = True
 
+    def fatal_exit(*lines, code=1):
+        """Unmuzzles, prints each line and exits. Shared by every fatal CLI path in main()."""
+        ensure_unmuzzled()
+        for line in lines:
+            print(line)
+        sys.exit(code)
+
     try:
         # If we are NOT in cron mode, unmuzzle immediately for a snappy CLI feel.
         # This makes the buffer purely a "Cron Safety" mechanism.
         if not args.cron:
             ensure_unmuzzled()
 
-        if args.repack and (args.reset_branch or args.reset_bag):
-            ensure_unmuzzled()
-            print("\n[FATAL ERROR] Ambiguous Command.")
-            print("-" * 60)
-            print("You cannot combine the GLOBAL '--repack' flag with LOCAL reset commands.")
-            print("")
-            print("1. To repack a SINGLE branch line from tree.txt:")
-            print("    Use: glacier --reset-branch <name> --run")
-            print("    (This automatically repacks that branch during re-upload)")
-            print("")
-            print("2. To repack YOUR ENTIRE INVENTORY:")
-            print("    Use: glacier --repack --run")
-            print("-" * 60)
-            sys.exit(1)
+        if args.repack and args.force_reset and (args.mirror_branch or args.mirror_bag):
+            fatal_exit(
+                "\n[FATAL ERROR] Ambiguous Command.",
+                "-" * 60,
+                "You cannot combine the GLOBAL '--repack' flag with LOCAL reset commands.",
+                "",
+                "1. To repack a SINGLE branch line from tree.txt:",
+                "    Use: glacier --mirror-branch <name> --force-reset --run",
+                "    (This automatically repacks that branch during re-upload)",
+                "",
+                "2. To repack YOUR ENTIRE INVENTORY:",
+                "    Use: glacier --repack --run",
+                "-" * 60,
+            )
 
         if not os.path.exists(args.tree_file):
-            ensure_unmuzzled()
-            print(f"Fatal: Tree file {args.tree_file} not found.")
-            sys.exit(1)
+            fatal_exit(f"Fatal: Tree file {args.tree_file} not found.")
+
+        # tree.txt is read once here; every consumer below shares this list
+        tree_lines = read_tree_lines(args.tree_file)
+        tree_by_path = index_tree_lines(tree_lines)
+
+        # CLI OVERRIDE: If user provides --interval, it overrides the config file for this run
+        if args.cron and args.interval is not None:
+            config.set('settings', 'scan_interval_days', str(args.interval))
+
+        # CRON FAST EXIT: a fresh single branch is decided from its last-scan stamp, before inventory.json is parsed
+        if args.cron and args.mirror_branch and not (args.mirror_bag or args.delete_bag):
+            stamped_line = tree_by_path.get(args.mirror_branch.split(" ::", 1)[0].strip())
+            if stamped_line and is_branch_fresh_fast(stamped_line, config):
+                sys.exit(0)
 
         # This will exit the script if inventory.json is corrupted
         inventory = load_inventory(INVENTORY_FILE)
@@ -3911,19 +4962,11 @@ def main():
         encryption_config = load_encryption_config(config_path)
 
         # This will exit the script if encryption is required but key.txt is missing
-        encrypt_list_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "encrypt.txt")    
-        PASSPHRASE_FILE = validate_encryption_config(args.tree_file)
-
-        with open(args.tree_file, 'r') as f:
-            tree_lines = [line.strip() for line in f if line.strip() and not line.startswith("#")]
-
-        # CLI OVERRIDE: If user provides --interval, it overrides the config file for this run
-        if args.cron and args.interval is not None:
-            config['scan_interval_days'] = args.interval
+        PASSPHRASE_FILE = validate_encryption_config(tree_lines)
 
-        # Empty the staging diectory
-        if args.run:
-          cleanup_staging_dir(STAGING_DIR)
+        # Split every tree line once into (line, path, tags) records
+        parsed_tree = parse_tree_lines(tree_lines)
+        locked_paths = index_locked_paths(parsed_tree)
 
         # --- INTERACTIVE COMMANDS ---
         # These always unmuzzle immediately (handled by the `if not args.cron` check above)
@@ -3978,8 +5021,7 @@ def main():
             restore_jobs = get_restore_targets(args, inventory)
             
             if not restore_jobs:
-                print("\n[STOP] No valid restore targets found.")
-                sys.exit(1)
+                fatal_exit("\n[STOP] No valid restore targets found.")
 
             print(f"\n[PLAN] Identified {len(restore_jobs)} target bag(s) for restoration.")
             
@@ -4000,32 +5042,19 @@ def main():
             try:
                 first_bag = f"bag_{int(target_ids[0].replace('bag_', '')):05d}"
             except (ValueError, IndexError):
-                print(f"[ERROR] Invalid Bag ID: {target_ids[0]}")
-                sys.exit(1)
-
-            parent_branch_key = None
-            for b_name, b_data in inventory.get("branches", {}).items():
-                for l_meta in b_data.get("leaves", {}).values():
-                    if l_meta.get("tar_id") == first_bag:
-                        parent_branch_key = b_name
-                        break
-                if parent_branch_key: break
+                fatal_exit(f"[ERROR] Invalid Bag ID: {target_ids[0]}")
+
+            bag_index = build_bag_index(inventory)
+            parent_branch_key = bag_index[first_bag][0][0] if first_bag in bag_index else None
             
-            if parent_branch_key:
-                target_line = next((l for l in tree_lines if parent_branch_key.split(" ::")[0] in l), None)
-                if target_line:
-                    # If we are mirroring WITH force-reset, or just deleting, we need PURGE permission
-                    action_needed = "FORCE" if (args.force_reset or is_delete_only) else "MIRROR"
-                    allowed, reason = is_action_permitted(target_line, action_needed)
-                    if not allowed:
-                        print(f"\n[!] FORBIDDEN: {reason}")
-                        sys.exit(1)
+            # MIRROR and FORCE are both refused on a LOCKED branch
+            if parent_branch_key and is_path_locked(parent_branch_key, tree_by_path, locked_paths):
+                fatal_exit(f"\n[!] FORBIDDEN: {LOCKED_REASON}")
 
             # Execute: requeue=True for mirror/reset, False for pure delete
-            if perform_rebag(inventory, target_ids, config, args.run, requeue=(not is_delete_only)):
+            if perform_rebag(inventory, target_ids, config, args.run, requeue=(not is_delete_only), bag_index=bag_index):
                 if args.run:
-                    with open(INVENTORY_FILE, 'w') as f:
-                        json.dump(inventory, f, indent=4)
+                    save_inventory(inventory)
                 
                 if is_delete_only: 
                     print(f"  [OK]: Bag(s) {target_ids} deleted from S3 and Inventory.")
@@ -4041,12 +5070,9 @@ def main():
             is_delete_only = True if args.delete_branch else False
 
             # --- IDENTITY TRACE ---
-            target_line = next((l for l in tree_lines if target_name in l), None)
-            if not target_line:
-                target_line = next((k for k in inventory["branches"].keys() if target_name in k), None)
+            target_line = lookup_branch_line(target_name, tree_by_path, tree_lines, inventory)
 
             # --- LOCKED GUARD ---
-            action_type = "FORCE" if (args.force_reset or is_delete_only) else "MIRROR"
             if target_line:
                 # CRON GATEKEEPER for Single Branch
                 if args.cron and not is_delete_only:
@@ -4059,19 +5085,15 @@ def main():
                          print(f"\n>>> CRON TRIGGER: {target_name}")
                          print(f"    {reason}")
 
-                allowed, reason = is_action_permitted(target_line, action_type)
-                if not allowed:
-                    ensure_unmuzzled()
-                    print(f"\n[!] FORBIDDEN: {reason}")
-                    sys.exit(1)
+                if is_path_locked(target_line, tree_by_path, locked_paths):
+                    fatal_exit(f"\n[!] FORBIDDEN: {LOCKED_REASON}")
 
             # --- DESTRUCTIVE PHASE ---
             if args.force_reset or is_delete_only:
                 ensure_unmuzzled()
                 reset_result = perform_branch_reset(inventory, target_name, config, args.run, tree_lines)
                 if reset_result and args.run:
-                    with open(INVENTORY_FILE, 'w') as f:
-                        json.dump(inventory, f, indent=4)
+                    save_inventory(inventory)
                     status_msg = "purged" if is_delete_only else "reset for fresh mirror"
                     print(f"  [STATUS]: Inventory {status_msg}.")
             
@@ -4081,39 +5103,11 @@ def main():
                 
             target_only = target_name
 
-        if args.delete_branch:
-            ensure_unmuzzled()
-            # 1. Guard Gate: Find the line in tree.txt to check for ::LOCKED
-            target_line = next((l for l in tree_lines if args.delete_branch in l), None)
-            
-            # If not in tree.txt, check the inventory keys to be sure
-            if not target_line:
-                target_line = next((k for k in inventory["branches"].keys() if args.delete_branch in k), None)
-
-            if target_line:
-                allowed, reason = is_action_permitted(target_line, "FORCE")
-                if not allowed:
-                    print(f"\n[!] FORBIDDEN: {reason}")
-                    sys.exit(1)
-
-            # 2. Execution: perform_branch_reset handles the S3 deletes and JSON removal
-            deleted_branch_key = perform_branch_reset(inventory, args.delete_branch, config, args.run, tree_lines)
-            
-            if deleted_branch_key:
-                if args.run:
-                    with open(INVENTORY_FILE, 'w') as f:
-                        json.dump(inventory, f, indent=4)
-                    print(f"  [STATUS] Branch '{args.delete_branch}' deleted from inventory.")
-                else:
-                    print(f"  [DRY RUN] Delete analysis complete.")
-            sys.exit(0)
-
         if args.delete_tree:
             ensure_unmuzzled()
             if perform_tree_delete(inventory, config, args.run, tree_lines):
                 if args.run:
-                    with open(INVENTORY_FILE, 'w') as f:
-                        json.dump(inventory, f, indent=4)
+                    save_inventory(inventory)
                     print(f"\n[OK] Global tree purge complete. Inventory updated.")
                 else:
                     print(f"\n[DRY RUN] Global analysis complete.")
@@ -4132,45 +5126,39 @@ def main():
             ensure_unmuzzled()
             print("!!! DRY-RUN MODE (Pass --run to execute) !!!")
 
-        for line in tree_lines:
-            current_path = line.split(' ::')[0].strip()        
-
-            allowed, reason = is_action_permitted(line, "MIRROR")
-            
-            if not allowed:
-                # In cron mode, locked branches are skipped silently.
-                if not args.cron:
-                    ensure_unmuzzled()
-                    print(f"  [LOCKED]: Skipping {current_path}")
-                continue
+        target_path = target_only.split(' ::')[0].strip() if target_only else None
 
-            if target_only:
-                target_path = target_only.split(' ::')[0].strip()
-                if current_path != target_path:
-                    continue
-            
         # --- CRON EXECUTION ---
+        # In cron mode, locked branches are skipped silently (see process_eligible_branches).
         if args.cron:
             work_was_performed = run_smart_cron(inventory, tree_lines, config, args, encryption_config)
         else:
             # Standard Loop (non-cron)
-            for line in tree_lines:
-                current_path = line.split(' ::')[0].strip()        
-                
+            branch_jobs = []
+            for line, current_path, tags in parsed_tree:
                 # Check for locks
-                allowed, reason = is_action_permitted(line, "MIRROR")
-                if not allowed:
+                if current_path in locked_paths:
                     ensure_unmuzzled()
                     print(f"  [LOCKED]: Skipping {current_path}")
                     continue
 
-                if target_only:
-                    target_path = target_only.split(' ::')[0].strip()
-                    if current_path != target_path:
-                        continue
+                if target_path and current_path != target_path:
+                    continue
                 
                 work_was_performed = True
-                process_branch(line, inventory, run_stats, args.run, args.limit, args.repack, PASSPHRASE_FILE, encryption_config)
+                branch_jobs.append(line)
+
+            # Each branch writes only its own run_stats[line] entry; shared inventory writes take INVENTORY_LOCK
+            if PARALLEL_BRANCHES > 1 and len(branch_jobs) > 1:
+                if args.run:
+                    cleanup_staging_once()
+                with ThreadPoolExecutor(max_workers=PARALLEL_BRANCHES) as ex:
+                    futures = [ex.submit(process_branch, line, inventory, run_stats, args.run, args.limit, args.repack, PASSPHRASE_FILE, encryption_config) for line in branch_jobs]
+                    for fut in as_completed(futures):
+                        fut.result()
+            else:
+                for line in branch_jobs:
+                    process_branch(line, inventory, run_stats, args.run, args.limit, args.repack, PASSPHRASE_FILE, encryption_config)
 
         # Summary and final artifacts happen after all lines are processed
         if work_was_performed:
@@ -4195,6 +5183,8 @@ def main():
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        UPLOAD_EXECUTOR.shutdown()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,24 @@
+"""The trimmed parser used for read-only verbs must yield the same namespace as the full parser."""
+import os
+import sys
+
+import pytest
+
+sys.argv = [sys.argv[0]]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import glacier  # noqa: E402
+
+
+def test_omitted_defaults_match_the_omitted_groups():
+    omitted = [group for group in glacier.ALL_ARGUMENT_GROUPS if group not in glacier.FAST_PATH_GROUPS]
+    assert vars(glacier.build_arg_parser(omitted).parse_args([])) == glacier.FAST_PATH_OMITTED_DEFAULTS
+
+
+@pytest.mark.parametrize("argv", [
+    ["--show-tree"],
+    ["--show-tree", "--cron", "--mirror-branch", "X"],
+    ["--report", "--limit", "5"],
+    ["--find", "name", "--tree-file", "other.cfg"],
+])
+def test_fast_path_matches_full_parse(argv):
+    assert vars(glacier.parse_cli_args(argv)) == vars(glacier.build_arg_parser().parse_args(argv))
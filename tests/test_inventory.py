@@ -0,0 +1,67 @@
+"""inventory.json round trips and the stored per-branch summary."""
+import os
+import sys
+
+import pytest
+
+sys.argv = [sys.argv[0]]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import glacier  # noqa: E402
+
+
+def sample_inventory():
+    return {"branches": {
+        "/data/Bücher ::MUTABLE": {"leaves": {
+            "/data/Bücher/日本": {"size_bytes": 5, "tar_id": "host-data-00001", "needs_upload": False,
+                                 "last_upload": "2026-01-01T00:00:00"},
+        }},
+    }}
+
+
+def test_stdlib_fallback_writes_the_same_bytes_as_orjson(tmp_path, monkeypatch):
+    if glacier.orjson is None:
+        pytest.skip("orjson not installed")
+    glacier.save_inventory(sample_inventory(), str(tmp_path / "orjson.json"))
+    monkeypatch.setattr(glacier, "orjson", None)
+    glacier.save_inventory(sample_inventory(), str(tmp_path / "stdlib.json"))
+
+    assert (tmp_path / "orjson.json").read_bytes() == (tmp_path / "stdlib.json").read_bytes()
+
+
+def test_stdlib_round_trip_keeps_non_ascii_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(glacier, "orjson", None)
+    path = str(tmp_path / "inventory.json")
+    glacier.save_inventory(sample_inventory(), path)
+
+    assert "Bücher" in (tmp_path / "inventory.json").read_text(encoding="utf-8")
+    assert glacier.load_inventory(path)["branches"].keys() == sample_inventory()["branches"].keys()
+
+
+def test_bag_commit_keeps_branch_summary_current_without_full_walk(tmp_path, monkeypatch):
+    inventory = sample_inventory()
+    inventory["branches"]["/data/other ::MUTABLE"] = {"leaves": {
+        "/data/other/a": {"size_bytes": 7, "tar_id": "host-other-00002", "needs_upload": True},
+    }}
+    glacier.summarize_inventory(inventory)
+    monkeypatch.setattr(glacier, "INVENTORY_FILE", str(tmp_path / "inventory.json"))
+    monkeypatch.setattr(glacier, "summarize_inventory", lambda inv: pytest.fail("full walk on bag commit"))
+
+    branch = inventory["branches"]["/data/other ::MUTABLE"]
+    glacier.commit_to_inventory([{"key": "/data/other/a"}], branch["leaves"], inventory, True, 2, etag="e")
+
+    assert branch["_summary"] == glacier.compute_branch_summary(branch["leaves"])
+    assert branch["_summary"]["last_upload"] == branch["leaves"]["/data/other/a"]["last_upload"]
+    saved = glacier.load_inventory(glacier.INVENTORY_FILE)
+    assert saved["branches"]["/data/other ::MUTABLE"]["_summary"] == branch["_summary"]
+
+
+def test_bag_numbers_are_counted_per_inventory_object():
+    def inventory_with_bag(number):
+        return {"branches": {"/old ::MUTABLE": {"leaves": {"/old/x": {"tar_id": f"bag_{number:05d}", "size_bytes": 1}}}}}
+
+    def assign_new_branch(inventory):
+        return glacier.assign_bags_to_leaves([{"key": "k", "tar_id": None, "size": 1}], inventory, {"k": {}}, False)
+
+    assert assign_new_branch(inventory_with_bag(3)) == 4
+    # A new dict (which CPython may place at the freed one's id) must not reuse the old maximum
+    assert assign_new_branch(inventory_with_bag(9)) == 10
@@ -0,0 +1,40 @@
+"""--show-leaf reads the manifest index only if the backup run built it, and never writes it."""
+import os
+import sys
+
+import pytest
+
+sys.argv = [sys.argv[0]]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import glacier  # noqa: E402
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(glacier, "MANIFEST_DIR", str(tmp_path))
+    monkeypatch.setattr(glacier, "MANIFEST_INDEX_FILE", str(tmp_path / ".manifest_index.sqlite"))
+    path = tmp_path / "20260101_host-data-00001_liverun.txt"
+    path.write_text("# Manifest for host-data-00001.tar\n/data/a/1\n/data/b/2\n/data/a/3\n")
+    return path
+
+
+def test_lookup_without_index_streams_and_creates_nothing(manifest):
+    assert glacier.manifest_lines_under(str(manifest), "/data/a/") == ["/data/a/1", "/data/a/3"]
+    assert not os.path.exists(glacier.MANIFEST_INDEX_FILE)
+
+
+def test_lookup_uses_index_built_by_backup_run(manifest, monkeypatch):
+    glacier.index_manifest(manifest.name)
+    # Served from SQLite: the file itself is never opened
+    monkeypatch.setattr("builtins.open", lambda *a, **k: pytest.fail("manifest streamed despite index"))
+
+    assert glacier.manifest_lines_under(str(manifest), "/data/a/") == ["/data/a/1", "/data/a/3"]
+
+
+def test_changed_manifest_is_streamed_not_reindexed(manifest):
+    glacier.index_manifest(manifest.name)
+    manifest.write_text("# Manifest\n/data/a/1\n/data/a/9\n/data/a/10\n")
+    index_mtime = os.stat(glacier.MANIFEST_INDEX_FILE).st_mtime_ns
+
+    assert glacier.manifest_lines_under(str(manifest), "/data/a/") == ["/data/a/1", "/data/a/9", "/data/a/10"]
+    assert os.stat(glacier.MANIFEST_INDEX_FILE).st_mtime_ns == index_mtime
@@ -0,0 +1,140 @@
+"""
+Round trip of a bag through stream_tar_to_s3 and stream_bag_to_staging against an
+in-memory stand-in for S3, so it runs without AWS credentials.
+"""
+import base64
+import hashlib
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+sys.argv = [sys.argv[0]]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import glacier  # noqa: E402
+
+
+class FakeBody:
+    """get_object Body that hands out small chunks, so writes continue past tar's end-of-archive."""
+    def __init__(self, data, fail_after=None):
+        self.data = data
+        self.fail_after = fail_after
+
+    def iter_chunks(self, chunk_size):
+        step = 64 * 1024
+        for offset in range(0, len(self.data), step):
+            if self.fail_after is not None and offset >= self.fail_after:
+                raise ConnectionError("connection reset")
+            yield self.data[offset:offset + step]
+
+    def close(self):
+        pass
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.lock = threading.Lock()
+        self.fail_after = None
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        with self.lock:
+            upload_id = f"upload-{len(self.uploads) + 1}"
+            self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, ChecksumAlgorithm):
+        self.uploads[UploadId][PartNumber] = bytes(Body)
+        digest = base64.b64encode(hashlib.sha256(Body).digest()).decode()
+        return {'ETag': f'"{PartNumber}"', 'ChecksumSHA256': digest}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.objects[Key] = b"".join(parts[p['PartNumber']] for p in MultipartUpload['Parts'])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+
+    def head_object(self, Bucket, Key, **kwargs):
+        return {'ETag': '"etag"', 'ChecksumSHA256': 'checksum', 'ContentLength': len(self.objects[Key])}
+
+    def get_object(self, Bucket, Key):
+        data = self.objects[Key]
+        return {'Body': FakeBody(data, self.fail_after), 'ContentLength': len(data)}
+
+
+@pytest.fixture
+def fake_s3(tmp_path, monkeypatch):
+    s3 = FakeS3()
+    monkeypatch.setattr(glacier, "s3_client", s3)
+    monkeypatch.setattr(glacier, "STAGING_DIR", str(tmp_path / "stage"))
+    monkeypatch.setattr(glacier, "STREAM_CHUNK_BYTES", 1024 * 1024)
+    os.makedirs(glacier.STAGING_DIR)
+    return s3
+
+
+@pytest.fixture
+def source(tmp_path):
+    leaf = tmp_path / "src" / "leaf"
+    leaf.mkdir(parents=True)
+    (leaf / "big.bin").write_bytes(os.urandom(3 * 1024 * 1024 + 123))
+    (leaf / "small.txt").write_text("hello\n")
+    return tmp_path / "src"
+
+
+def upload_bag(source, key):
+    cmd = glacier.generate_final_tar_command("-", [], ["-C", str(source), "leaf"])
+    return glacier.stream_tar_to_s3(cmd, "bucket", key, 3 * 1024 * 1024, 0)
+
+
+def test_restore_bag_built_by_stream_tar_to_s3(fake_s3, source):
+    upload_bag(source, "bag.tar")
+    # The bag ends with record padding that tar never reads
+    assert len(fake_s3.objects["bag.tar"]) % (glacier.TAR_BLOCKING_FACTOR * 512) == 0
+
+    temp_dir = glacier.stream_bag_to_staging("bucket", "bag.tar", "bag1")
+
+    for name in ("big.bin", "small.txt"):
+        restored = os.path.join(temp_dir, "leaf", name)
+        with open(restored, "rb") as f:
+            assert f.read() == (source / "leaf" / name).read_bytes()
+
+
+def test_restore_bag_with_default_record_size(fake_s3, source):
+    fake_s3.objects["old.tar"] = subprocess.run(
+        ["tar", "-cf", "-", "-C", str(source), "leaf"], check=True, stdout=subprocess.PIPE
+    ).stdout
+
+    temp_dir = glacier.stream_bag_to_staging("bucket", "old.tar", "old")
+
+    assert (source / "leaf" / "small.txt").read_text() == open(os.path.join(temp_dir, "leaf", "small.txt")).read()
+
+
+def test_truncated_bag_fails_and_removes_restore_dir(fake_s3, source):
+    upload_bag(source, "bag.tar")
+    fake_s3.objects["bag.tar"] = fake_s3.objects["bag.tar"][:1024 * 1024]
+
+    with pytest.raises(RuntimeError):
+        glacier.stream_bag_to_staging("bucket", "bag.tar", "bag1")
+    assert not os.path.exists(os.path.join(glacier.STAGING_DIR, "restore_bag1"))
+
+
+def test_download_error_removes_restore_dir(fake_s3, source):
+    upload_bag(source, "bag.tar")
+    fake_s3.fail_after = 1024 * 1024
+
+    with pytest.raises(ConnectionError):
+        glacier.stream_bag_to_staging("bucket", "bag.tar", "bag1")
+    assert not os.path.exists(os.path.join(glacier.STAGING_DIR, "restore_bag1"))
+
+
+def test_failed_tar_keeps_existing_object(fake_s3, source):
+    fake_s3.objects["bag.tar"] = b"good bag"
+
+    with pytest.raises(subprocess.CalledProcessError):
+        glacier.stream_tar_to_s3(["tar", "-cf", "-", str(source / "missing")], "bucket", "bag.tar", 1024, 0)
+    assert fake_s3.objects["bag.tar"] == b"good bag"
+    assert fake_s3.uploads == {}